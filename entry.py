@@ -1,4 +1,8 @@
+import multiprocessing
+
 from src_py.__main__ import main
 
 if __name__ == '__main__':
+    # required for the training worker process in frozen builds
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -35,6 +35,7 @@ type ConvoText = {
 	text: string
 	trust: number
 	tokens?: string[]
+	profile?: string
 }
 
 type LoopPatch = {
@@ -3,19 +3,79 @@ TRUST_MOD = 0.2
 
 GEN_OUTPUT_LENGTH_MAX = 32
 GEN_OUTPUT_LENGTH_MIN = 8
+GEN_DECODING_PROFILE = "quality"
+GEN_DECODING_PROFILES = {
+    "quality": {"num_beams": 5, "max_new_tokens": GEN_OUTPUT_LENGTH_MAX},
+    "balanced": {"num_beams": 2, "max_new_tokens": GEN_OUTPUT_LENGTH_MAX},
+    "fast": {"num_beams": 1, "max_new_tokens": 24},
+    # greedy decoding verified by the draft model, same output as plain greedy
+    "speculative": {
+        "num_beams": 1,
+        "max_new_tokens": GEN_OUTPUT_LENGTH_MAX,
+        "do_sample": False,
+        "assisted": True,
+    },
+}
+GEN_ADAPTIVE_DECODING = True  # fall back to cheaper profiles under load
+# profiles the adaptive fallback steps through, from most to least expensive
+# (others, e.g. "speculative", are only used if configured or requested)
+GEN_ADAPTIVE_PROFILES = ["quality", "balanced", "fast"]
+GEN_LATENCY_TARGET = 4.0  # seconds, p95 of recent generations
+GEN_QUEUE_TARGET = 2  # queued requests
+GEN_LATENCY_WINDOW = 50  # number of recent generations for the p95
+
+GEN_KV_CACHE_MAX_MB = 512  # memory budget for cached prompt key/values
+GEN_HISTORY_MAX_TOKENS = 1024  # token budget for the conversation history in a prompt
 
 CLS_MAX_LENGTH = 512
 CLS_EPOCH_SIZE = 1600
-CLS_BATCH_SIZE = 16
+CLS_BATCH_SIZE = 16  # effective batch size per optimizer step
+CLS_MICRO_BATCH_SIZE = 16  # gradients of BATCH / MICRO batches are accumulated
+CLS_AUTOCAST_BF16 = False  # bf16 autocast for forward & backward
+CLS_GRADIENT_CHECKPOINTING = False  # recompute activations to save memory
 CLS_LEARNING_RATE = 3e-5
+CLS_TRAINING_MODE = "full"  # "full" trains all weights, "lora" only adapters
+CLS_LORA_RANK = 8
+CLS_LORA_ALPHA = 16
+CLS_LORA_LEARNING_RATE = 5e-4
+CLS_LORA_TARGETS = ["query_proj", "value_proj"]
+CLS_LORA_TRAINABLE = ["pooler", "classifier"]  # trained next to the adapters
+CLS_SHADOW_MODEL = False  # train a copy, serve a snapshot published atomically
+CLS_PUBLISH_STEPS = 0  # optimizer steps between snapshots (0: at epoch end only)
+CLS_TRAIN_WORKER = False  # train in a separate process, serving only loads weights
+CLS_TOKEN_CACHE_MAX_FILES = 8  # token cache files before they are merged at start
+CLS_INFER_BATCH_MAX = 8
+CLS_INFER_BATCH_WINDOW = 0.005  # seconds to wait for more queued inputs
+
+INFER_TIMEOUT = 120.0  # seconds a request waits for its response
+INFER_RESULT_TTL = 300.0  # seconds until unclaimed results are dropped
+LOOP_IDLE_TIMEOUT = 1.0  # max seconds the idle loop sleeps between housekeeping
+LOOP_AUTO_TRAIN_IDLE = 60.0  # idle seconds until training starts by itself (None: off)
+
+QUANTIZE_INFERENCE = False  # int8 dynamic quantization of linear layers on CPU
+
+# None keeps the torch / OS default
+SERVE_THREADS = None  # torch intra-op threads for generation and classification
+SERVE_INTEROP_THREADS = None  # torch inter-op threads of the serving process
+SERVE_CPU_AFFINITY = None  # cores of the serving process, e.g. [0, 1, 2, 3]
+TRAIN_THREADS = None  # torch intra-op threads for classifier training
+TRAIN_INTEROP_THREADS = None  # torch inter-op threads of the training worker
+TRAIN_CPU_AFFINITY = None  # cores of the training worker (CLS_TRAIN_WORKER only)
+TOKENIZERS_PARALLELISM = False  # rust thread pool of the fast tokenizers
 
-MAX_DATA_FOLDERS = 2
+DATA_BUFFER_MAX = 256  # new rows kept in memory before they are merged into the dataset
+DATA_MAX_SEGMENTS = 8  # segments per split before they are compacted into a new base
 
 DATA_PATH = ["data"]
 DATA_SUB_PROTECTED = "base"
+DATA_SUB_SEGMENTS = "segments"
+DATA_SUB_TOKENS = "token_cache"
+DATA_SUB_RECOVERED = "recovered"  # data that failed to load is moved here
+DATA_MANIFEST = "manifest.json"
 
 MODEL_ROOT = ["models"]
 GEN_NAME = "pythia-mod"
+GEN_DRAFT_NAME = "pythia-draft"  # optional, see tools/generator_prepare_draft.py
 CLS_NAME = "inter-classifier"
 
 # NOT IN USE
@@ -1,10 +1,16 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
+import asyncio
+import sys
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # src
+# (torch, transformers & datasets are imported in the background by LoopHandle)
 from .utils import (
     setup_env,
     get_uvi_info,
@@ -13,18 +19,26 @@ from .utils import (
     LoopPatch,
     DataIndex,
 )
-from .loop import MainLoop
+from .startup import LoopHandle, profile_startup
 
 # END IMPORT BLOCK ###########################################################
 
 
 def main():
-    ### Props
-    loop = MainLoop()
+    ### Startup Profile
+    if "--profile-startup" in sys.argv:
+        profile_startup()
+        return
 
     ### Initialization
+    # affinity only applies to threads started afterwards
     setup_env()
-    loop.start()
+
+    ### Props
+    # the ML stack is imported and the models are loaded in the background
+    # while the server already answers
+    handle = LoopHandle()
+    handle.start()
     uvi_port, uvi_host = get_uvi_info()
     el_url = get_host_info()
 
@@ -40,6 +54,12 @@ def main():
         allow_headers=["*"],
     )
 
+    async def get_loop():
+        loop = await handle.get()
+        if loop is None:
+            raise HTTPException(status_code=503, detail="The backend is not ready.")
+        return loop
+
     ### API Routes
     @app.get("/favicon.ico")
     async def favicon():
@@ -53,7 +73,10 @@ def main():
 
     @app.get("/status")
     async def status():
-        return {}
+        # the app counts any 200 as online, so it has to wait for the models
+        status = handle.get_status()
+        code = 200 if status["ready"] else 503
+        return JSONResponse(status_code=code, content=jsonable_encoder(status))
 
     @app.post("/api/echo")
     async def echo(input: ConvoText):
@@ -62,14 +85,41 @@ def main():
 
     @app.post("/api/update")
     async def update(patch: LoopPatch):
+        loop = await get_loop()
         return await loop.update(patch)
 
+    @app.get("/api/stats")
+    async def stats():
+        if handle.loop is None:
+            return {"state": handle.get_status()["state"]}
+        return handle.loop.get_stats()
+
     @app.post("/api/infer")
     async def infer(input: ConvoText):
-        return await loop.infer(input)
+        loop = await get_loop()
+        try:
+            return await loop.infer(input)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Inference timed out.")
+
+    @app.post("/api/infer_stream")
+    async def infer_stream(input: ConvoText):
+        loop = await get_loop()
+
+        async def events():
+            try:
+                async for chunk in loop.infer_stream(input):
+                    # "done" carries the complete response, it replaces the tokens
+                    event = "done" if chunk.tokens is None else "token"
+                    yield f"event: {event}\ndata: {chunk.json()}\n\n"
+            except asyncio.TimeoutError:
+                yield "event: error\ndata: Inference timed out.\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
 
     @app.post("/api/get_message")
     async def get_message(input: DataIndex):
+        loop = await get_loop()
         id = input.id
         return loop.get_message(id)
 
@@ -1,25 +1,204 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
+import copy
+import hashlib
+import math
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
+import psutil
 import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
 from torch.utils.data import DataLoader
 
-from typing import Any, Iterator
+from typing import Any, Iterable, Iterator, List, Optional
 from transformers import (
     DebertaV2Tokenizer,
     DebertaV2ForSequenceClassification,
+    DataCollatorWithPadding,
     get_scheduler,
 )
-from datasets import DatasetDict
+from transformers.trainer_pt_utils import LengthGroupedSampler
+from transformers.utils import SAFE_WEIGHTS_NAME
+import pyarrow as pa
+from datasets import Dataset, DatasetDict
 
 # Local Imports
 from . import __backend_config as config
-from .utils import get_resource_path, get_cuda, ClassifierLabels, Mood
+from .lora import apply_lora, merge_lora, lora_state_dict
+from .utils import (
+    get_resource_path,
+    get_cuda,
+    get_folder_mtime,
+    get_quantized_model,
+    get_timestamp,
+    quantize_model,
+    read_arrow_table,
+    remove_folder,
+    write_arrow_table,
+    ClassifierLabels,
+    Mood,
+)
 
 # END IMPORT BLOCK ###########################################################
 
-# tok_data_cls: {'input_ids': [int], 'token_type_ids': [int], 'attention_mask': [int], 'labels': int}
+# tok_data_cls: {'input_ids': [int], 'labels': int} -> padded with attention_mask by the collator
+
+
+class BackgroundIterator:
+    """
+    Pulls items from an iterable in a background thread
+    so the next item is ready while the current one is processed.
+    """
+
+    _done = object()
+
+    def __init__(self, iterable: Iterable, prefetch: int = 2) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, args=(iterable,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self) -> Any:
+        if self._finished:
+            raise StopIteration
+        item = self._queue.get()
+        if item is self._done:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def close(self) -> None:
+        """
+        Stops the background thread, e.g. when an epoch is abandoned.
+        """
+        self._stop.set()
+
+    def _run(self, iterable: Iterable) -> None:
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._put(e)
+        self._put(self._done)
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class TokenCache:
+    """
+    Persistent cache of classifier token ids keyed by a hash of the text.\n
+    Entries live in memory-mapped Arrow files in a folder named after the
+    tokenizer fingerprint, so a changed tokenizer starts a fresh cache.
+    Only texts that are not cached yet are tokenized.
+    """
+
+    def __init__(self, tokenizer: Any, root: str) -> None:
+        self.tokenizer = tokenizer
+        self.path = os.path.join(root, self._get_fingerprint())
+        os.makedirs(self.path, exist_ok=True)
+        self._rows: dict[str, int] = {}
+        self._table: pa.Table | None = None
+        self._load()
+
+    def get(self, texts: List[str]) -> List[List[int]]:
+        """
+        Returns the token ids of all texts, tokenizing and storing new ones.
+        """
+        keys = [self._hash(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows:
+                missing[key] = text
+        if missing:
+            self._append(list(missing.keys()), list(missing.values()))
+        rows = pa.array([self._rows[key] for key in keys], type=pa.int64())
+        return self._table.column("input_ids").take(rows).to_pylist()  # type: ignore
+
+    def _append(self, keys: List[str], texts: List[str]) -> None:
+        encoded = self.tokenizer(
+            texts, max_length=config.CLS_MAX_LENGTH, truncation=True
+        )["input_ids"]
+        table = pa.table(
+            {
+                "key": pa.array(keys, type=pa.string()),
+                "input_ids": pa.array(encoded, type=pa.list_(pa.int32())),
+            }
+        )
+        path = os.path.join(self.path, get_timestamp() + ".arrow")
+        write_arrow_table(table, path)
+        self._add_table(read_arrow_table(path))
+        if config.DEBUG_MSG:
+            print(f"Tokenized and cached {len(keys)} new texts")
+
+    def _add_table(self, table: pa.Table) -> None:
+        offset = 0 if self._table is None else self._table.num_rows
+        for row, key in enumerate(table.column("key").to_pylist()):
+            self._rows[key] = offset + row
+        if self._table is None:
+            self._table = table
+        else:
+            self._table = pa.concat_tables([self._table, table])
+
+    def _load(self) -> None:
+        """
+        Memory-maps all cache files, merging them first if there are too many.
+        """
+        files = sorted(
+            entry.path
+            for entry in os.scandir(self.path)
+            if entry.name.endswith(".arrow")
+        )
+        if len(files) > config.CLS_TOKEN_CACHE_MAX_FILES:
+            merged = pa.concat_tables([read_arrow_table(path) for path in files])
+            merged_path = os.path.join(self.path, get_timestamp() + ".arrow")
+            write_arrow_table(merged, merged_path)
+            del merged
+            for path in files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # still mapped by another process (training worker),
+                    # merged again on a later start, duplicate keys are harmless
+                    pass
+            files = [merged_path]
+        for path in files:
+            self._add_table(read_arrow_table(path))
+        if config.DEBUG_MSG:
+            print(f"Loaded {len(self._rows)} cached tokenizations from {self.path}")
+
+    def _get_fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        digest.update(type(self.tokenizer).__name__.encode())
+        digest.update(str(len(self.tokenizer)).encode())
+        digest.update(str(config.CLS_MAX_LENGTH).encode())
+        vocab_file = getattr(self.tokenizer, "vocab_file", None)
+        if vocab_file is not None and os.path.exists(vocab_file):
+            with open(vocab_file, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
+
+    def _hash(self, text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
 
 
 class Classifier:
@@ -33,16 +212,34 @@ class Classifier:
     _optimizer: torch.optim.AdamW
     _scheduler: Any
 
-    _enumerator: Iterator
+    _enumerator: BackgroundIterator | None = None
     _current_batch_idx: int
     _num_batches: int
 
     _load_path: str
     _save_path: str
+    _adapter_path: str
 
-    def __init__(self):
+    def __init__(self, serving: bool = True):
         self._setup_paths()
         self.device = get_cuda()
+
+        # Checkpoint Props
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._save_future: Future | None = None
+        self._steps_since_save = 0
+        self.last_save_seconds = 0.0
+
+        # Training Props
+        self._accumulation_steps = max(
+            1, config.CLS_BATCH_SIZE // config.CLS_MICRO_BATCH_SIZE
+        )
+        self._pending_micro_batches = 0
+        self._epoch_start = 0.0
+        self._epoch_steps = 0
+        self.steps_per_second = 0.0
+        self.peak_memory_mb = 0.0
+
         self.model = DebertaV2ForSequenceClassification.from_pretrained(
             self._load_path, num_labels=len(ClassifierLabels.dict)
         ).to(  # type: ignore
@@ -50,19 +247,73 @@ class Classifier:
         )
         self.tokenizer = DebertaV2Tokenizer.from_pretrained(self._load_path)
 
+        # lora mode trains adapters on the frozen checkpoint from the load path
+        self.lora = config.CLS_TRAINING_MODE == "lora"
+        if self.lora:
+            apply_lora(
+                self.model,
+                config.CLS_LORA_TARGETS,
+                config.CLS_LORA_TRAINABLE,
+                config.CLS_LORA_RANK,
+                config.CLS_LORA_ALPHA,
+            )
+            self._load_adapter()
+
+        if config.CLS_GRADIENT_CHECKPOINTING:
+            self.model.gradient_checkpointing_enable()
+            if self.lora:
+                # frozen embeddings would cut the graph of checkpointed layers
+                self.model.enable_input_require_grads()
+
+        self.data_collator = DataCollatorWithPadding(
+            tokenizer=self.tokenizer, return_tensors="pt"
+        )
+        self.token_cache = TokenCache(
+            self.tokenizer,
+            os.path.join(
+                get_resource_path(), *config.DATA_PATH, config.DATA_SUB_TOKENS
+            ),
+        )
+
+        # inference runs on an int8 copy if quantization is enabled on CPU
+        # and on a frozen snapshot in shadow mode, otherwise on the trained model
+        # (a training worker process never serves and skips the copies)
+        self.quantized = (
+            serving and config.QUANTIZE_INFERENCE and self.device.type == "cpu"
+        )
+        self.shadow = serving and config.CLS_SHADOW_MODEL
+        self.snapshot_version = 0
+        if self.quantized and not self.lora:
+            self.infer_model = get_quantized_model(
+                lambda: copy.deepcopy(self.model),
+                self._load_path,
+                config.CLS_NAME,
+            )
+        elif self.quantized or self.shadow:
+            # adapters change every epoch, the merged copy is not cached on disk
+            self.infer_model = self._snapshot()
+        else:
+            self.infer_model = self.model
+
     # PUBLIC METHODS ###########################################################
     def prepare_epoch(self, data: DatasetDict) -> None:
         # TODO: Check if this improves stability
         # torch.cuda.empty_cache()
 
-        self._tokenized_data = data.map(
-            self._preprocess,
-            batched=True,
-            remove_columns=data["train"].column_names,
-        )
-        self._tokenized_data.set_format(
-            type="torch",
-            columns=["input_ids", "token_type_ids", "attention_mask", "labels"],
+        # token ids are gathered unpadded from the cache,
+        # batches are padded (and masked) by the collator
+        self._tokenized_data = DatasetDict(
+            {
+                split: Dataset.from_dict(
+                    {
+                        "input_ids": self.token_cache.get(data[split]["input"]),
+                        "labels": [
+                            ClassifierLabels.dict[e] for e in data[split]["mood"]
+                        ],
+                    }
+                )
+                for split in data.keys()
+            }
         )
 
         # initialize batch counter
@@ -76,29 +327,73 @@ class Classifier:
     def prepare_inference(self) -> None:
         self.model.eval()
 
+    def publish(self) -> None:
+        """
+        Replaces the served snapshot by a copy of the current training weights.
+        The reference swap is atomic, running inference keeps the old snapshot.
+        """
+        if self.infer_model is self.model:
+            return
+        self.infer_model = self._snapshot()
+        self.snapshot_version += 1
+        if config.DEBUG_MSG:
+            print(f"Published classifier snapshot {self.snapshot_version}")
+
+    def import_weights(self, path: str) -> None:
+        """
+        Loads the checkpoint (or adapter in lora mode) a training worker
+        just wrote and publishes it.
+        The file is memory-mapped, tensors are copied into the model.
+        """
+        weights = load_file(path, device=str(self.device))
+        self.model.load_state_dict(weights, strict=not self.lora)
+        self.publish()
+        if config.DEBUG_MSG:
+            print("Loaded classifier weights from " + path)
+
     def step(self) -> bool:
+        """
+        Runs forward & backward on one micro batch and steps the optimizer once
+        gradients of CLS_BATCH_SIZE examples have been accumulated.
+        """
         try:
-            batch = batch = next(self._enumerator)
+            batch = next(self._enumerator)  # type: ignore
             self._current_batch_idx += 1
         except StopIteration:
-            # All batches have been processed
+            # All batches have been processed, apply leftover gradients
+            if self._pending_micro_batches > 0:
+                self._optimizer_step()
             self._save()
             if config.DEBUG_MSG:
-                print("Epoch finished")
+                print(
+                    f"Epoch finished at {self.steps_per_second:.2f} steps/s, "
+                    f"peak memory {self.peak_memory_mb:.0f} MB"
+                )
             return True
 
+        # inference between steps switches the model to eval mode
+        if not self.model.training:
+            self.model.train()
+        if self._epoch_start == 0.0:
+            self._epoch_start = time.perf_counter()
+
         batch = {k: v.to(self.device) for k, v in batch.items()}
-        outputs = self.model(**batch)
+        with torch.autocast(
+            device_type=self.device.type,
+            dtype=torch.bfloat16,
+            enabled=config.CLS_AUTOCAST_BF16,
+        ):
+            outputs = self.model(**batch)
         loss = outputs.loss
         if loss is None:
             raise ValueError(
                 "Loss is None. Check the model configuration and input data."
             )
-        loss.backward()
+        (loss / self._accumulation_steps).backward()
+        self._pending_micro_batches += 1
 
-        self._optimizer.step()
-        self._scheduler.step()
-        self._optimizer.zero_grad()
+        if self._pending_micro_batches >= self._accumulation_steps:
+            self._optimizer_step()
 
         if config.DEBUG_MSG:
             print(
@@ -107,9 +402,35 @@ class Classifier:
 
         return False
 
+    def _optimizer_step(self) -> None:
+        self._optimizer.step()
+        self._scheduler.step()
+        self._optimizer.zero_grad()
+        self._pending_micro_batches = 0
+        self._steps_since_save += 1
+
+        # throughput & memory of the current epoch
+        self._epoch_steps += 1
+        elapsed = time.perf_counter() - self._epoch_start
+        if elapsed > 0:
+            self.steps_per_second = self._epoch_steps / elapsed
+        if self.device.type == "cuda":
+            peak = torch.cuda.max_memory_allocated(self.device)
+        else:
+            peak = psutil.Process().memory_info().rss
+        self.peak_memory_mb = max(self.peak_memory_mb, peak / 2**20)
+
+        if (
+            self.shadow
+            and config.CLS_PUBLISH_STEPS > 0
+            and self._epoch_steps % config.CLS_PUBLISH_STEPS == 0
+        ):
+            self.publish()
+
     def infer(self, text: str):
-        # Set model to eval mode
-        self.model.eval()
+        # Set model to eval mode (a publish may swap the snapshot meanwhile)
+        model = self.infer_model
+        model.eval()
 
         # Get input text and tokenize
         inputs = self.tokenizer(text, return_tensors="pt")
@@ -117,7 +438,7 @@ class Classifier:
 
         # Run inference
         with torch.no_grad():
-            logits = self.model(**inputs).logits
+            logits = model(**inputs).logits
 
         # Get predicted class
         predicted_class_id = logits.argmax().item()
@@ -125,6 +446,34 @@ class Classifier:
         # Decode and return
         return self._translate_to_mood(predicted_class_id)
 
+    def infer_batch(self, texts: List[str]) -> List[Mood]:
+        """
+        Classifies multiple texts in a single padded forward pass.
+        """
+        # Set model to eval mode (a publish may swap the snapshot meanwhile)
+        model = self.infer_model
+        model.eval()
+
+        # Tokenize all texts padded to the longest one in the batch
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=config.CLS_MAX_LENGTH,
+            return_tensors="pt",
+        )
+        inputs.to(self.device)
+
+        # Run inference
+        with torch.no_grad():
+            logits = model(**inputs).logits
+
+        # Get predicted classes
+        predicted_class_ids = logits.argmax(dim=-1).tolist()
+
+        # Decode and return
+        return [self._translate_to_mood(num_cls) for num_cls in predicted_class_ids]
+
     # END PUBLIC METHODS #######################################################
 
     # PRIVATE METHODS ##########################################################
@@ -136,42 +485,59 @@ class Classifier:
         return mood
 
     def _setup_helpers(self) -> None:
+        # group examples of similar length so batches carry little padding
+        train = self._tokenized_data["train"]
+        lengths = [len(ids) for ids in train["input_ids"]]
+        micro_batch_size = min(config.CLS_MICRO_BATCH_SIZE, config.CLS_BATCH_SIZE)
         self._train_dataloader = DataLoader(
-            self._tokenized_data["train"],  # type: ignore
-            batch_size=config.CLS_BATCH_SIZE,
-            shuffle=True,
+            train,  # type: ignore
+            batch_size=micro_batch_size,
+            sampler=LengthGroupedSampler(micro_batch_size, lengths=lengths),
+            collate_fn=self.data_collator,
         )
 
+        # in lora mode only adapters and head require gradients
+        lr = config.CLS_LORA_LEARNING_RATE if self.lora else config.CLS_LEARNING_RATE
         self._optimizer = torch.optim.AdamW(
-            self.model.parameters(),
-            lr=config.CLS_LEARNING_RATE,
-            fused=True,
+            [p for p in self.model.parameters() if p.requires_grad],
+            lr=lr,
+            fused=self.device.type == "cuda",  # fused AdamW is CUDA only
         )
 
         self._scheduler = get_scheduler(
             "linear",
             optimizer=self._optimizer,
             num_warmup_steps=100,
-            num_training_steps=len(self._train_dataloader),
+            num_training_steps=math.ceil(
+                len(self._train_dataloader) / self._accumulation_steps
+            ),
         )
-
-        # turn dataloader into an iterator & get number of batches
-        self._enumerator = iter(self._train_dataloader)
+        self._pending_micro_batches = 0
+        self._epoch_start = 0.0
+        self._epoch_steps = 0
+
+        # turn dataloader into an iterator that collates the next batch
+        # in the background & get number of batches
+        if self._enumerator is not None:
+            self._enumerator.close()
+        self._enumerator = BackgroundIterator(self._train_dataloader)
         self._num_batches = len(self._train_dataloader)
 
-    def _preprocess(self, example: Any) -> Any:
-        output_dict = self.tokenizer(
-            example["input"],
-            padding="max_length",
-            max_length=config.CLS_MAX_LENGTH,
-            truncation=True,
-        )
-        output_dict["labels"] = [ClassifierLabels.dict[e] for e in example["mood"]]
-        return output_dict
+    def wait_for_save(self) -> Optional[str]:
+        """
+        Blocks until the last background checkpoint has been written.
+        Returns the path of the written weights file, None if the write failed.
+        """
+        if self._save_future is None:
+            return None
+        return self._save_future.result()
 
     def _setup_paths(self) -> None:
         root = os.path.join(get_resource_path(), *config.MODEL_ROOT)
         self._save_path = os.path.join(root, "current", config.CLS_NAME)
+        self._adapter_path = os.path.join(
+            root, "current", config.CLS_NAME + "-lora", "adapter.safetensors"
+        )
 
         # check what folders exist in root
         folders = os.listdir(root)
@@ -184,6 +550,7 @@ class Classifier:
             os.mkdir(os.path.join(root, "current"))
             self._load_path = os.path.join(root, "base", config.CLS_NAME)
         else:
+            self._recover_checkpoint()
             # check if there is a model in current
             if config.CLS_NAME not in os.listdir(os.path.join(root, "current")):
                 # if not, set base as load path
@@ -191,8 +558,158 @@ class Classifier:
             else:
                 self._load_path = os.path.join(root, "current", config.CLS_NAME)
 
-    def _save(self):
-        self.model.save_pretrained(self._save_path)
-        self.tokenizer.save_pretrained(self._save_path)
+    def _recover_checkpoint(self) -> None:
+        """
+        Cleans up after a checkpoint swap that was interrupted.
+        A half written '.tmp' folder is dropped, a previous checkpoint
+        left as '.old' is restored if the new one never made it into place.
+        """
+        old_path = self._save_path + ".old"
+        tmp_path = self._save_path + ".tmp"
+        if os.path.isdir(tmp_path):
+            remove_folder(tmp_path)
+        if os.path.isdir(old_path):
+            if os.path.isdir(self._save_path):
+                remove_folder(old_path)
+            else:
+                os.replace(old_path, self._save_path)
+
+    def _save(self) -> None:
+        """
+        Snapshots the weights in memory and writes the checkpoint in the background.
+        Skipped if no step ran since the last checkpoint.
+        """
+        if self._steps_since_save == 0:
+            if config.DEBUG_MSG:
+                print("No steps since the last checkpoint, skipping save")
+            return
+        self._steps_since_save = 0
+
+        # wait for the previous checkpoint so at most one snapshot is held
+        self.wait_for_save()
+        if self.lora:
+            adapter = lora_state_dict(self.model)
+            self._save_future = self._writer.submit(self._write_adapter, adapter)
+        else:
+            state_dict = {
+                k: v.detach().to("cpu", copy=True).contiguous()
+                for k, v in self.model.state_dict().items()
+            }
+            self._save_future = self._writer.submit(self._write_checkpoint, state_dict)
+
+        # serve the trained weights from now on
+        self.publish()
+
+    def _snapshot(self) -> torch.nn.Module:
+        """
+        Returns a frozen inference copy of the model (merged and quantized if enabled).
+        """
+        model = copy.deepcopy(self.model)
+        if self.lora:
+            merge_lora(model)
+        if self.quantized:
+            return quantize_model(model)
+        model.eval()
+        model.requires_grad_(False)
+        return model
+
+    def _write_checkpoint(self, state_dict: dict) -> Optional[str]:
+        """
+        Runs on the writer thread. Writes the checkpoint to a temporary folder
+        and swaps it into place so the save path always holds a complete model.
+        Returns the path of the weights file.
+        A failed write is logged and cleaned up, training continues
+        and the next epoch writes a new checkpoint.
+        """
+        start = time.perf_counter()
+        tmp_path = self._save_path + ".tmp"
+        old_path = self._save_path + ".old"
+        try:
+            if os.path.isdir(tmp_path):
+                remove_folder(tmp_path)
+            # safetensors checkpoints are memory-mapped by from_pretrained
+            self.model.save_pretrained(
+                tmp_path, state_dict=state_dict, safe_serialization=True
+            )
+            self.tokenizer.save_pretrained(tmp_path)
+
+            if os.path.isdir(self._save_path):
+                os.replace(self._save_path, old_path)
+            os.replace(tmp_path, self._save_path)
+            if os.path.isdir(old_path):
+                remove_folder(old_path)
+        except Exception as e:
+            print("Saving the classifier checkpoint failed:", e)
+            # _recover_checkpoint() handles anything left on the next start
+            try:
+                if os.path.isdir(old_path) and not os.path.isdir(self._save_path):
+                    os.replace(old_path, self._save_path)
+                if os.path.isdir(tmp_path):
+                    remove_folder(tmp_path)
+            except OSError:
+                pass
+            return None
+
+        self.last_save_seconds = time.perf_counter() - start
         if config.DEBUG_MSG:
-            print("Saved updated model to " + self._save_path)
+            print(
+                f"Saved updated model to {self._save_path} "
+                f"in {self.last_save_seconds:.2f}s"
+            )
+        return os.path.join(self._save_path, SAFE_WEIGHTS_NAME)
+
+    def _write_adapter(self, adapter: dict) -> Optional[str]:
+        """
+        Runs on the writer thread. Saves the adapter weights together with
+        the checkpoint they were trained on and swaps the file into place.
+        Returns the path of the adapter file.
+        A failed write is logged and leaves the previous adapter in place.
+        """
+        start = time.perf_counter()
+        tmp_path = self._adapter_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._adapter_path), exist_ok=True)
+            # the backbone is stored as metadata, safetensors only holds tensors
+            metadata = {"backbone": self._get_backbone_id()}
+            save_file(adapter, tmp_path, metadata=metadata)
+            os.replace(tmp_path, self._adapter_path)
+        except Exception as e:
+            print("Saving the classifier adapter failed:", e)
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+
+        self.last_save_seconds = time.perf_counter() - start
+        if config.DEBUG_MSG:
+            print(
+                f"Saved adapter to {self._adapter_path} "
+                f"in {self.last_save_seconds:.2f}s"
+            )
+        return self._adapter_path
+
+    def _load_adapter(self) -> None:
+        """
+        Loads saved adapter weights if they were trained on the current backbone.
+        """
+        if not os.path.exists(self._adapter_path):
+            return
+        with safe_open(self._adapter_path, "pt", device=str(self.device)) as f:
+            metadata = f.metadata() or {}
+            if metadata.get("backbone") != self._get_backbone_id():
+                print("Saved adapter belongs to another checkpoint and is ignored.")
+                return
+            adapter = {key: f.get_tensor(key) for key in f.keys()}
+        self.model.load_state_dict(adapter, strict=False)
+        if config.DEBUG_MSG:
+            print("Loaded adapter from " + self._adapter_path)
+
+    def _get_backbone_id(self) -> str:
+        """
+        Identifies the frozen checkpoint by its location and modification time.
+        """
+        root = os.path.join(get_resource_path(), *config.MODEL_ROOT)
+        backbone = os.path.relpath(self._load_path, root)
+        return f"{backbone}|{get_folder_mtime(self._load_path)}"
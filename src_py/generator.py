@@ -1,8 +1,11 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
 import os
+import math
 import random
-from typing import List, Any, Iterator
+import time
+from collections import OrderedDict, deque
+from typing import List, Any, Callable, Iterator, Optional, Tuple
 
 import pandas as pd
 
@@ -10,20 +13,203 @@ import torch
 from torch.utils.data import DataLoader
 
 from transformers import (
+    BatchEncoding,
     get_scheduler,
     GPTNeoXForCausalLM,
     GPTNeoXTokenizerFast,
     DataCollatorForLanguageModeling,
+    StoppingCriteria,
+    StoppingCriteriaList,
 )
+from transformers.generation.streamers import BaseStreamer
 from datasets import DatasetDict, Dataset
 
 # Local Imports
 from . import __backend_config as config
-from .utils import get_resource_path, get_cuda, SpecialTokens, InterData
+from .utils import (
+    get_resource_path,
+    get_cuda,
+    get_quantized_model,
+    SpecialTokens,
+    InterData,
+)
 
 # END IMPORT BLOCK ###########################################################
 
 
+class KVCache:
+    """
+    LRU cache of prompt key/values per conversation.
+    Entries are evicted once the total size exceeds GEN_KV_CACHE_MAX_MB.
+    """
+
+    def __init__(self, max_mb: float = config.GEN_KV_CACHE_MAX_MB) -> None:
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: OrderedDict[int, Tuple[torch.Tensor, Any, int]] = OrderedDict()
+        self._size = 0
+
+    def lookup(self, convoID: int, input_ids: torch.Tensor) -> Tuple[Any, int]:
+        """
+        Returns the cached key/values for the longest common token prefix
+        of the cached and the given ids together with the prefix length.
+        """
+        entry = self._entries.get(convoID)
+        if entry is None:
+            return None, 0
+        self._entries.move_to_end(convoID)
+        cached_ids, past, _ = entry
+
+        # length of the common prefix, the last input token is always recomputed
+        limit = min(cached_ids.shape[-1], input_ids.shape[-1] - 1)
+        mismatch = (cached_ids[0, :limit] != input_ids[0, :limit]).nonzero()
+        prefix_len = int(mismatch[0, 0]) if len(mismatch) > 0 else limit
+        if prefix_len == 0:
+            return None, 0
+        if prefix_len < cached_ids.shape[-1]:
+            past = tuple(tuple(t[:, :, :prefix_len] for t in layer) for layer in past)
+        return past, prefix_len
+
+    def store(self, convoID: int, input_ids: torch.Tensor, past: Any) -> None:
+        """
+        Stores the key/values of the given ids and evicts the least recently used entries.
+        """
+        self.invalidate(convoID)
+        size = sum(t.element_size() * t.nelement() for layer in past for t in layer)
+        if size > self.max_bytes:
+            return
+        self._entries[convoID] = (input_ids, past, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted
+
+    def invalidate(self, convoID: int) -> None:
+        """
+        Removes the entry of a conversation if there is one.
+        """
+        entry = self._entries.pop(convoID, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+
+class SentenceStoppingCriteria(StoppingCriteria):
+    """
+    Stops generation once every sequence either completed a sentence
+    after min_new_tokens or emitted one of the stop tokens.
+    Works for sampling and beam search as all rows are checked.
+    """
+
+    def __init__(
+        self,
+        prompt_length: int,
+        sentence_end_ids: torch.Tensor,
+        stop_ids: torch.Tensor,
+        min_new_tokens: int = config.GEN_OUTPUT_LENGTH_MIN,
+    ) -> None:
+        self.prompt_length = prompt_length
+        self.sentence_end_ids = sentence_end_ids
+        self.stop_ids = stop_ids
+        self.min_new_tokens = min_new_tokens
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        generated = input_ids[:, self.prompt_length :]
+        stopped = torch.isin(generated, self.stop_ids.to(generated.device)).any(dim=1)
+        if generated.shape[-1] >= self.min_new_tokens:
+            after_min = generated[:, self.min_new_tokens - 1 :]
+            ended = torch.isin(after_min, self.sentence_end_ids.to(generated.device))
+            stopped |= ended.any(dim=1)
+        return bool(stopped.all())
+
+
+class DecodingController:
+    """
+    Picks the decoding profile for each generation.
+    Steps down GEN_ADAPTIVE_PROFILES to a cheaper profile for every
+    load signal (queue depth, p95 latency) above its target.
+    """
+
+    def __init__(self) -> None:
+        self.profiles = config.GEN_ADAPTIVE_PROFILES
+        self.latencies: deque[float] = deque(maxlen=config.GEN_LATENCY_WINDOW)
+        self.last_profile = config.GEN_DECODING_PROFILE
+
+    def choose(self, requested: Optional[str] = None, queue_depth: int = 0) -> str:
+        """
+        Returns the requested profile if it exists, otherwise the configured
+        one, adapted to the current load if GEN_ADAPTIVE_DECODING is set.
+        """
+        if requested in config.GEN_DECODING_PROFILES:
+            profile = requested
+        else:
+            profile = config.GEN_DECODING_PROFILE
+            if config.GEN_ADAPTIVE_DECODING and profile in self.profiles:
+                level = self.profiles.index(profile)
+                if queue_depth > config.GEN_QUEUE_TARGET:
+                    level += 1
+                if self.get_p95() > config.GEN_LATENCY_TARGET:
+                    level += 1
+                profile = self.profiles[min(level, len(self.profiles) - 1)]
+        if config.DEBUG_MSG and profile != self.last_profile:
+            print(f"Decoding profile changed: {self.last_profile} -> {profile}")
+        self.last_profile = profile
+        return profile
+
+    def record(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+
+    def get_p95(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+
+
+class ResponseStreamer(BaseStreamer):
+    """
+    Receives generated tokens from generate() and passes newly available
+    response text to a callback. The filter decides how much of the decoded
+    text may already be sent, e.g. only complete words.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        on_text: Callable[[str, List[str]], None],
+        filter: Callable[[str, bool], str],
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.on_text = on_text
+        self.filter = filter
+        self.token_ids: List[int] = []
+        self.pending_tokens: List[str] = []
+        self.sent = ""
+        self._prompt_skipped = False
+
+    def put(self, value: torch.Tensor) -> None:
+        # the first call contains the prompt
+        if not self._prompt_skipped:
+            self._prompt_skipped = True
+            return
+        ids = value.flatten().tolist()
+        self.token_ids.extend(ids)
+        self.pending_tokens.extend(self.tokenizer.convert_ids_to_tokens(ids))
+        self._emit(final=False)
+
+    def end(self) -> None:
+        self._emit(final=True)
+
+    def _emit(self, final: bool) -> None:
+        text = self.tokenizer.decode(self.token_ids, skip_special_tokens=False)
+        filtered = self.filter(text, final)
+        if len(filtered) <= len(self.sent) or not filtered.startswith(self.sent):
+            return
+        self.on_text(filtered[len(self.sent) :], self.pending_tokens)
+        self.sent = filtered
+        self.pending_tokens = []
+
+
 class Generator:
     """
     Generates text using a finetuned Pythia variant.
@@ -48,11 +234,38 @@ class Generator:
         # set this in the step() method from the TataLoader
         self.trained_conIDs: List[int] = []
 
-        self.model = GPTNeoXForCausalLM.from_pretrained(self.modelpath).to(self.device)  # type: ignore
+        self.quantized = config.QUANTIZE_INFERENCE and self.device.type == "cpu"
+        if self.quantized:
+            self.model = get_quantized_model(
+                lambda: GPTNeoXForCausalLM.from_pretrained(self.modelpath),
+                self.modelpath,
+                config.GEN_NAME,
+            )
+        else:
+            self.model = GPTNeoXForCausalLM.from_pretrained(self.modelpath).to(self.device)  # type: ignore
         self.tokenizer = GPTNeoXTokenizerFast.from_pretrained(self.modelpath)
+        # the draft model costs memory, it is loaded up front only if a
+        # configured profile uses it, requested profiles load it on first use
+        self.draft_model: Any = None
+        self._draft_loaded = False
+        configured = [config.GEN_DECODING_PROFILE]
+        if config.GEN_ADAPTIVE_DECODING:
+            configured += config.GEN_ADAPTIVE_PROFILES
+        if any(
+            config.GEN_DECODING_PROFILES[name].get("assisted", False)
+            for name in configured
+        ):
+            self._get_draft_model()
         self.data_collator = DataCollatorForLanguageModeling(
             tokenizer=self.tokenizer, mlm=False
         )
+        self.kv_cache = KVCache()
+        self.controller = DecodingController()
+        self._setup_stop_ids()
+
+        # Early Stopping Stats
+        self.last_tokens_saved = 0
+        self.total_tokens_saved = 0
 
         torch.backends.cuda.matmul.allow_tf32 = True  # type: ignore
         self.model.eval()
@@ -127,25 +340,87 @@ class Generator:
         self.conIDs_trained = []
         return current
 
-    def infer(self, input: str, return_tokens: bool = False) -> str | Any:
+    def infer(
+        self,
+        input: str,
+        return_tokens: bool = False,
+        convoID: Optional[int] = None,
+        input_ids: Optional[List[int]] = None,
+        streamer: Optional[BaseStreamer] = None,
+        profile: Optional[str] = None,
+    ) -> str | Any:
+        """
+        Generates a continuation of the input string.
+        Already encoded input_ids of the input string skip tokenization.
+        If a convoID is given, the key/values of the prompt prefix shared
+        with the previous turn of that conversation are reused.
+        A streamer receives the tokens while generating, which generate()
+        only supports without beam search.
+        The decoding profile defaults to GEN_DECODING_PROFILE.
+        """
         self.model.eval()
+        settings = config.GEN_DECODING_PROFILES[profile or config.GEN_DECODING_PROFILE]
+        num_beams = settings["num_beams"] if streamer is None else 1
+        max_new_tokens = settings["max_new_tokens"]
+        do_sample = settings.get("do_sample", True)
+        # assisted generation needs the draft model and does not stream
+        assistant = None
+        if settings.get("assisted", False) and streamer is None:
+            assistant = self._get_draft_model()
 
         # Get input text and tokenize
-        inputs = self.tokenizer(input, return_tensors="pt")
+        if input_ids is not None:
+            ids = torch.tensor([input_ids], dtype=torch.long)
+            inputs = BatchEncoding(
+                {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+            )
+        else:
+            inputs = self.tokenizer(input, return_tensors="pt")
         inputs.to(self.device)
+        prompt_length = inputs["input_ids"].shape[-1]
 
         # Run inference
+        start = time.perf_counter()
         with torch.no_grad():
+            kwargs = {}
+            if assistant is not None:
+                kwargs["assistant_model"] = assistant
+            elif convoID is not None and inputs["input_ids"].shape[-1] > 1:
+                past = self._get_prompt_cache(convoID, inputs["input_ids"])
+                # generate() expects one cache row per beam
+                kwargs["past_key_values"] = tuple(
+                    tuple(t.repeat_interleave(num_beams, dim=0) for t in layer)
+                    for layer in past
+                )
+
             generated_tokens = self.model.generate(
                 **inputs,
-                do_sample=True,
-                num_beams=5,
-                max_new_tokens=config.GEN_OUTPUT_LENGTH_MAX,
+                **kwargs,
+                do_sample=do_sample,
+                num_beams=num_beams,
+                max_new_tokens=max_new_tokens,
                 min_length=config.GEN_OUTPUT_LENGTH_MIN,
                 no_repeat_ngram_size=2,
                 pad_token_id=self.tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList(
+                    [
+                        SentenceStoppingCriteria(
+                            prompt_length, self._sentence_end_ids, self._stop_ids
+                        )
+                    ]
+                ),
             )
 
+        self.controller.record(time.perf_counter() - start)
+
+        # count the tokens early stopping did not have to generate
+        generated_length = generated_tokens.shape[-1] - prompt_length
+        self.last_tokens_saved = max(0, max_new_tokens - generated_length)
+        self.total_tokens_saved += self.last_tokens_saved
+        if config.DEBUG_MSG:
+            print(f"Early stopping saved {self.last_tokens_saved} tokens")
+
         raw = self.tokenizer.decode(generated_tokens[0], skip_special_tokens=False)
 
         # handle encoding errors
@@ -164,9 +439,81 @@ class Generator:
         # Decode and return the generated text
         return raw
 
+    def invalidate(self, convoID: int) -> None:
+        """
+        Drops the cached prompt of a conversation, e.g. when its history was rewritten.
+        """
+        self.kv_cache.invalidate(convoID)
+
     # END PUBLIC METHODS #######################################################
 
     # PRIVATE METHODS ##########################################################
+    def _get_draft_model(self) -> Any:
+        """
+        Returns the draft model for speculative decoding, loading it on first use.
+        """
+        if not self._draft_loaded:
+            self._draft_loaded = True
+            self.draft_model = self._load_draft_model()
+        return self.draft_model
+
+    def _load_draft_model(self) -> Any:
+        """
+        Loads the draft model for speculative decoding if it was prepared.
+        Returns None otherwise, assisted profiles then fall back to plain decoding.
+        """
+        draftpath = os.path.join(
+            get_resource_path(), *config.MODEL_ROOT, "base", config.GEN_DRAFT_NAME
+        )
+        if not os.path.exists(draftpath):
+            if config.DEBUG_MSG:
+                print("No draft model found, speculative decoding disabled")
+            return None
+        draft = GPTNeoXForCausalLM.from_pretrained(draftpath).to(self.device)  # type: ignore
+        if draft.config.vocab_size != self.model.config.vocab_size:
+            print("Draft model vocabulary does not match, speculative decoding off")
+            return None
+        draft.eval()
+        return draft
+
+    def _setup_stop_ids(self) -> None:
+        """
+        Collects the ids of all tokens that end a sentence
+        and of the special tokens that end a response.
+        """
+        vocab = self.tokenizer.convert_ids_to_tokens(list(range(len(self.tokenizer))))
+        sentence_end_ids = [
+            idx
+            for idx, token in enumerate(vocab)
+            if token is not None
+            and token not in self.tokenizer.all_special_tokens
+            and token.rstrip().endswith((".", "!", "?"))
+        ]
+        stop_ids = self.tokenizer.convert_tokens_to_ids(
+            [SpecialTokens.endseq, SpecialTokens.input]
+        )
+        self._sentence_end_ids = torch.tensor(sentence_end_ids, dtype=torch.long)
+        self._stop_ids = torch.tensor(stop_ids, dtype=torch.long)
+
+    def _get_prompt_cache(self, convoID: int, input_ids: torch.Tensor) -> Any:
+        """
+        Returns the key/values of all but the last prompt token.
+        Only the tokens not covered by the cache of the previous turn are computed.
+        """
+        past, prefix_len = self.kv_cache.lookup(convoID, input_ids)
+        prompt_len = input_ids.shape[-1] - 1
+        if prefix_len < prompt_len:
+            outputs = self.model(
+                input_ids[:, prefix_len:prompt_len],
+                past_key_values=past,
+                use_cache=True,
+            )
+            past = outputs.past_key_values
+        if config.DEBUG_MSG:
+            print(f"KV cache reused {prefix_len} of {prompt_len} prompt tokens")
+        self.kv_cache.store(convoID, input_ids[:, :prompt_len], past)
+        return past
+
     # def _preprocess(self, example) -> None:
     #     return self.tokenizer(
     #         example["string"],
@@ -1,55 +1,90 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
 import asyncio
+import queue
 import threading
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from transformers.modeling_utils import no_init_weights
 
 # Local Imports
 from . import __backend_config as config
-from .utils import ConvoText, Mood, LoopPatch, get_timestamp
+from .utils import ConvoText, Mood, LoopPatch, get_timestamp, use_threads
 
 from .manager_conversation import ConvoManager
 from .manager_data import DataManager
 from .classifier import Classifier
-from .generator import Generator
+from .worker import TrainingWorker
+from .generator import Generator, ResponseStreamer
 
 # END IMPORT BLOCK ###########################################################
 
 
+def _set_future_result(future: asyncio.Future, result: Any) -> None:
+    """
+    Sets the result of a future unless it was cancelled in the meantime.
+    """
+    if not future.done():
+        future.set_result(result)
+
+
 class MainLoop:
     """
     Runs the training steps and allows to interrupt for inference.
+    Queued inference requests are served between single training steps
+    and training starts on its own once inference was idle for a while.
     All models and data are managed here. FastAPI only calls the
     methods of this class.
     """
 
     def __init__(self) -> None:
         # Loop Props
-        self.__inference_queue = asyncio.Queue()
-        self.__results: dict[int, ConvoText] = {}
+        self.__inference_queue: queue.Queue[ConvoText] = queue.Queue()
+        self._wake = threading.Event()
+        # pending requests: (future, event loop, creation time, stream queue or None)
+        self.__results: dict[Tuple[int, int], Tuple[Any, Any, float, Any]] = {}
+        self._results_lock = threading.Lock()
+        self._last_expiry = time.monotonic()
         self._thread = threading.Thread(target=self._run_loop_in_thread)
         self._thread.daemon = True  # to end the loop if the main thread ends
         self.state = LoopPatch.State.loading
 
+        # Utilization Props
+        self._started_at = time.monotonic()
+        self._idle_time = 0.0
+
+        # Loading Props
+        # models and data are loaded by the loop thread, see _load_components()
+        self._ready = threading.Event()
+        self._loaded = threading.Event()  # set once loading succeeded or failed
+        self._pending_state = LoopPatch.State.inference
+        self._load_seconds: Optional[float] = None
+        self._components = {
+            name: {"ready": False, "seconds": None, "error": None}
+            for name in ("data", "classifier", "generator")
+        }
+
         # Model Props
-        self._convo_manager = ConvoManager()
-        self._data_manager = DataManager()
-        self._classifier = Classifier()
-        self._generator = Generator()
+        self._data_manager: DataManager
+        self._classifier: Classifier
+        self._generator: Generator
+        self._convo_manager: ConvoManager
+        self._worker = TrainingWorker() if config.CLS_TRAIN_WORKER else None
 
         # Loop Flags
         self._enter_state = True
         self._new_epoch = True
+        self._auto_training = False
+        self._last_inference = time.monotonic()
 
         # Inference Props
-        self._active_split = self._data_manager.get_split()
+        self._active_split = ""
 
         # Trust Score
         self._trust_score = 0.0
 
-        # Start with inference
-        self.state = LoopPatch.State.inference
-
     async def _loop(self) -> None:
         """
         Asynchronous method that defines the main loop.
@@ -61,11 +96,12 @@ class MainLoop:
                 # ENTER TRAINING CALLBACK ########################################
                 if self._enter_state:
                     self._enter_training()
+                # PREEMPTION FLOW ################################################
+                # pending inference takes priority over the next step, with a
+                # shadow classifier one batch is served per step instead
+                self._serve_inference(drain=not self._classifier.shadow)
                 # TRAINING FLOW ##################################################
-                if self._new_epoch:
-                    self._enter_epoch()
-                # TRAINING FLOW ##################################################
-                self._new_epoch = self._classifier.step()
+                self._train_step()
                 # END TRAINING FLOW ##############################################
 
             if self.state == LoopPatch.State.inference:
@@ -73,78 +109,378 @@ class MainLoop:
                 if self._enter_state:
                     self._enter_inference()
                 # INFERENCE FLOW #################################################
-                while not self.__inference_queue.empty():
-                    input_data: ConvoText = await self.__inference_queue.get()
-
-                    # 0) get datapoint from data manager
-                    datapoint = self._data_manager.get_datapoint(input_data)
-
-                    # 1) get classification for input_data and update trust score
-                    if (input_data.text == "") or (input_data.text is None):
-                        mood = Mood.doubt
-                    else:
-                        mood = self._classifier.infer(input_data.text)
-
-                    if mood == Mood.truth:
-                        self._trust_score = min(
-                            1.0, self._trust_score + config.TRUST_MOD
-                        )
-                    elif mood == Mood.lie:
-                        self._trust_score = max(
-                            0.0, self._trust_score - config.TRUST_MOD
-                        )
-                    datapoint.mood = mood
-                    datapoint.trust = self._trust_score
-
-                    # 2) instruct generator to create response -> response
-                    # get context for generator
-                    context = self._convo_manager.get_context(mood=mood)
-                    datapoint.context = context
-
-                    # get the input string for the generator
-                    input_str = self._convo_manager.get_gen_inference_str(
-                        input_data, mood=mood, context=context
-                    )
-
-                    # generator: run inference on input string
-                    utf = self._generator.infer(input_str)
-
-                    # filter out response
-                    response = self._convo_manager.filter_response(utf)
-                    datapoint.response = response
-
-                    # create response object
-                    response_object = ConvoText(
-                        convoID=input_data.convoID,
-                        messageID=input_data.messageID,
-                        text=response,
-                        timestamp=get_timestamp(),
-                        type=ConvoText.ConvoType.response,
-                        trust=self._trust_score,
-                    )
-
-                    # make results available in the dictionary
-                    self.__results[input_data.messageID] = response_object
-
-                    # 3) add datapoint to data manager (data manager will evaluate mood)
-                    self._data_manager.add(datapoint, self._active_split)
-
-                    self.__inference_queue.task_done()
+                if self._serve_inference():
+                    self._auto_training = False
                 # END INFERENCE FLOW #############################################
+                # AUTO TRAINING FLOW #############################################
+                elif self._should_auto_train():
+                    if not self._auto_training:
+                        self._enter_auto_training()
+                    self._train_step()
+                # END AUTO TRAINING FLOW #########################################
+
+            # drop results nobody is waiting for anymore
+            self._expire_results()
+            # load weights published by the training worker
+            self._poll_worker()
+
+            # IDLE FLOW ##########################################################
+            # sleep until work arrives or the state changes
+            self._idle_wait()
+            # END IDLE FLOW ######################################################
 
             if self.state == LoopPatch.State.exit:
                 # EXIT FLOW ######################################################
+                if self._worker is not None:
+                    self._worker.stop()
+                # write pending rows before the process ends
+                self._data_manager.save()
+                self._data_manager.wait_for_save()
                 if config.DEBUG_MSG:
                     print("Loop ended...")
                 break
                 # END EXIT FLOW ##################################################
 
+    def _serve_inference(self, drain: bool = True) -> bool:
+        """
+        Answers all queued inference requests batch by batch
+        (or only the next batch if drain is False).
+        Returns True if at least one request was served.
+        """
+        if self.__inference_queue.empty():
+            return False
+        use_threads("serve")
+        while not self.__inference_queue.empty():
+            batch = self._collect_batch()
+
+            # 1) get classifications for the whole batch at once
+            moods = self._classify_batch(batch)
+
+            for input_data, mood in zip(batch, moods):
+                # 0) get datapoint from data manager
+                datapoint = self._data_manager.get_datapoint(input_data)
+
+                # update trust score
+                if mood == Mood.truth:
+                    self._trust_score = min(1.0, self._trust_score + config.TRUST_MOD)
+                elif mood == Mood.lie:
+                    self._trust_score = max(0.0, self._trust_score - config.TRUST_MOD)
+                datapoint.mood = mood
+                datapoint.trust = self._trust_score
+
+                # 2) instruct generator to create response -> response
+                # get context for generator
+                context = self._convo_manager.get_context(
+                    mood=mood, convoID=input_data.convoID
+                )
+                datapoint.context = context
+
+                # a new conversation rewrites the history of the previous one
+                if input_data.convoID != self._convo_manager.convoID:
+                    self._generator.invalidate(self._convo_manager.convoID)
+
+                # get the input string for the generator
+                input_str = self._convo_manager.get_gen_inference_str(
+                    input_data, mood=mood, context=context
+                )
+
+                # generator: run inference on input string
+                # (streamed requests receive partial responses while generating)
+                utf = self._generator.infer(
+                    input_str,
+                    convoID=input_data.convoID,
+                    input_ids=self._convo_manager.current_ids,
+                    streamer=self._get_streamer(input_data),
+                    profile=self._generator.controller.choose(
+                        input_data.profile, self.__inference_queue.qsize()
+                    ),
+                )
+
+                # filter out response
+                response = self._convo_manager.filter_response(utf)
+                datapoint.response = response
+
+                # create response object
+                response_object = ConvoText(
+                    convoID=input_data.convoID,
+                    messageID=input_data.messageID,
+                    text=response,
+                    timestamp=get_timestamp(),
+                    type=ConvoText.ConvoType.response,
+                    trust=self._trust_score,
+                )
+
+                # resolve the future of the waiting request
+                self._resolve(input_data, response_object)
+
+                # 3) add datapoint to data manager (data manager will evaluate mood)
+                self._data_manager.add(datapoint, self._active_split)
+
+                self.__inference_queue.task_done()
+
+            if not drain:
+                break
+
+        self._last_inference = time.monotonic()
+        return True
+
+    def _train_step(self) -> None:
+        """
+        Runs a single classifier training step and starts a new epoch if needed.
+        With a training worker the steps run in its process, the loop only
+        hands out the next epoch once the last one was published.
+        """
+        if self._worker is not None:
+            # a dead worker is replaced by _poll_worker() in this iteration
+            if not self._worker.busy and self._worker.is_alive():
+                self._enter_epoch()
+            return
+        use_threads("train")
+        if self._new_epoch:
+            self._enter_epoch()
+        self._new_epoch = self._classifier.step()
+
+    def _should_auto_train(self) -> bool:
+        """
+        Returns True once the inference queue was idle for LOOP_AUTO_TRAIN_IDLE seconds.
+        """
+        if config.LOOP_AUTO_TRAIN_IDLE is None:
+            return False
+        return time.monotonic() - self._last_inference >= config.LOOP_AUTO_TRAIN_IDLE
+
+    def _collect_batch(self) -> List[ConvoText]:
+        """
+        Drains the inference queue into a batch.
+        Waits up to CLS_INFER_BATCH_WINDOW seconds for further inputs
+        until CLS_INFER_BATCH_MAX inputs are collected.
+        """
+        batch: List[ConvoText] = [self.__inference_queue.get_nowait()]
+        deadline = time.monotonic() + config.CLS_INFER_BATCH_WINDOW
+        while len(batch) < config.CLS_INFER_BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self.__inference_queue.get(timeout=remaining))
+                else:
+                    batch.append(self.__inference_queue.get_nowait())
+            except queue.Empty:
+                break
+        if config.DEBUG_MSG:
+            print(f"Collected inference batch of size {len(batch)}")
+        return batch
+
+    def _is_idle(self) -> bool:
+        """
+        Returns True if the loop has nothing to do in its current state.
+        """
+        if self._enter_state:
+            return False
+        if self.state == LoopPatch.State.exit:
+            return False
+        training = self.state == LoopPatch.State.training or (
+            self.state == LoopPatch.State.inference and self._should_auto_train()
+        )
+        # a busy training worker leaves the loop nothing to do but waiting
+        if training and (self._worker is None or not self._worker.busy):
+            return False
+        return self.__inference_queue.empty()
+
+    def _idle_wait(self) -> None:
+        """
+        Blocks the loop thread until it is woken by infer() or update().
+        Wakes up after LOOP_IDLE_TIMEOUT at the latest for housekeeping
+        or earlier if auto training is due.
+        """
+        self._wake.clear()
+        # re-check after clearing so no wake-up between check and wait is lost
+        if not self._is_idle():
+            return
+        timeout = config.LOOP_IDLE_TIMEOUT
+        if config.LOOP_AUTO_TRAIN_IDLE is not None:
+            due = self._last_inference + config.LOOP_AUTO_TRAIN_IDLE
+            remaining = due - time.monotonic()
+            if remaining > 0:
+                timeout = min(timeout, remaining)
+        start = time.monotonic()
+        self._wake.wait(timeout=timeout)
+        self._idle_time += time.monotonic() - start
+
+    def _classify_batch(self, batch: List[ConvoText]) -> List[Mood]:
+        """
+        Returns the mood for every input in the batch.
+        Empty inputs are not classified and default to doubt.
+        """
+        moods = [Mood.doubt] * len(batch)
+        indices = [i for i, item in enumerate(batch) if item.text]
+        if indices:
+            results = self._classifier.infer_batch([batch[i].text for i in indices])
+            for i, mood in zip(indices, results):
+                moods[i] = mood
+        return moods
+
+    def _resolve(self, input: ConvoText, result: ConvoText) -> None:
+        """
+        Hands a result to the request waiting for it.
+        The future is resolved on the event loop it was created on.
+        """
+        with self._results_lock:
+            pending = self.__results.pop((input.convoID, input.messageID), None)
+        if pending is None:
+            if config.DEBUG_MSG:
+                print(f"No request waiting for message {input.messageID}")
+            return
+        future, event_loop, _, stream = pending
+        try:
+            if stream is not None:
+                # close the stream before the final result is set
+                event_loop.call_soon_threadsafe(stream.put_nowait, None)
+            event_loop.call_soon_threadsafe(_set_future_result, future, result)
+        except RuntimeError:
+            # the event loop of the request is already closed
+            pass
+
+    def _get_streamer(self, input: ConvoText) -> Optional[ResponseStreamer]:
+        """
+        Returns a streamer that forwards partial responses to a streaming request
+        or None if the request waits for the full response.
+        """
+        with self._results_lock:
+            pending = self.__results.get((input.convoID, input.messageID))
+        if pending is None or pending[3] is None:
+            return None
+        _, event_loop, _, stream = pending
+
+        def on_text(text: str, tokens: List[str]) -> None:
+            chunk = ConvoText(
+                convoID=input.convoID,
+                messageID=input.messageID,
+                text=text,
+                timestamp=get_timestamp(),
+                type=ConvoText.ConvoType.response,
+                trust=self._trust_score,
+                tokens=tokens,
+            )
+            try:
+                event_loop.call_soon_threadsafe(stream.put_nowait, chunk)
+            except RuntimeError:
+                # the event loop of the request is already closed
+                pass
+
+        return ResponseStreamer(
+            self._generator.tokenizer, on_text, self._convo_manager.filter_partial
+        )
+
+    def _expire_results(self) -> None:
+        """
+        Cancels and removes pending requests older than INFER_RESULT_TTL.
+        Runs at most once per second.
+        """
+        now = time.monotonic()
+        if now - self._last_expiry < 1.0:
+            return
+        self._last_expiry = now
+        with self._results_lock:
+            expired = [
+                key
+                for key, (_, _, created, _) in self.__results.items()
+                if now - created > config.INFER_RESULT_TTL
+            ]
+            orphans = [self.__results.pop(key) for key in expired]
+        for future, event_loop, _, _ in orphans:
+            try:
+                event_loop.call_soon_threadsafe(future.cancel)
+            except RuntimeError:
+                pass
+        if config.DEBUG_MSG and orphans:
+            print(f"Expired {len(orphans)} orphaned results")
+
+    def _poll_worker(self) -> None:
+        """
+        Loads the weights the training worker published since the last poll.
+        Falls back to training in the loop thread once the worker has died.
+        """
+        if self._worker is None:
+            return
+        paths = self._worker.poll()
+        if paths:
+            # every epoch overwrites the same file, the latest one is enough
+            self._classifier.import_weights(paths[-1])
+        if self._worker.is_alive():
+            return
+
+        print("Training worker stopped, training continues in the loop thread")
+        # the pending epoch was never trained, its rows are not counted
+        if self._worker.busy:
+            self._data_manager.revert_cls_data()
+        self._worker = None
+        self._new_epoch = True
+
+    def _load_components(self) -> bool:
+        """
+        Loads the database and both models concurrently.
+        Returns False if a component could not be loaded.
+        """
+        start = time.monotonic()
+        loaders: dict[str, Callable[[], Any]] = {
+            "data": DataManager,
+            "classifier": Classifier,
+            "generator": Generator,
+        }
+        # entered once for all loads: every from_pretrained toggles this flag
+        # globally, concurrent loads would otherwise restore it out of order
+        with no_init_weights(), ThreadPoolExecutor(len(loaders)) as pool:
+            futures = {
+                name: pool.submit(self._load_component, name, loader)
+                for name, loader in loaders.items()
+            }
+        components = {name: future.result() for name, future in futures.items()}
+        self._load_seconds = time.monotonic() - start
+        if any(component is None for component in components.values()):
+            return False
+
+        self._data_manager = components["data"]
+        self._classifier = components["classifier"]
+        self._generator = components["generator"]
+        self._convo_manager = ConvoManager(self._generator.tokenizer)
+        self._active_split = self._data_manager.get_split()
+        if config.DEBUG_MSG:
+            print(f"Components loaded in {self._load_seconds:.2f}s")
+        return True
+
+    def _load_component(self, name: str, loader: Callable[[], Any]) -> Any:
+        """
+        Runs a single loader and records its timing or error for /status.
+        """
+        start = time.monotonic()
+        try:
+            component = loader()
+        except Exception as e:
+            print(f"Loading the {name} failed:", e)
+            self._components[name]["error"] = str(e)
+            return None
+        finally:
+            self._components[name]["seconds"] = round(time.monotonic() - start, 3)
+        self._components[name]["ready"] = True
+        return component
+
     def _run_loop_in_thread(self) -> None:
         """
-        Runs the main loop in a separate thread using asyncio's event loop.
+        Loads all components, then runs the main loop in a separate thread
+        using asyncio's event loop.
         It sets a new event loop, runs the main loop in this event loop,
         and finally closes the event loop when the main loop completes.
         """
+        if not self._load_components():
+            self.state = LoopPatch.State.error
+            self._loaded.set()
+            return
+        # apply the state requested while loading
+        self.state = self._pending_state
+        self._ready.set()
+        self._loaded.set()
+        if self._worker is not None:
+            self._worker.start()
+
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(self._loop())
@@ -157,6 +493,30 @@ class MainLoop:
         """
         self._thread.start()
 
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Blocks until loading has finished or timeout seconds passed.
+        Returns True if all components are loaded.
+        """
+        self._loaded.wait(timeout)
+        return self.is_ready()
+
+    def get_status(self) -> dict:
+        """
+        Returns the loop state and the readiness and load time of every component.
+        """
+        return {
+            "state": self.state,
+            "ready": self.is_ready(),
+            "load_seconds": (
+                round(self._load_seconds, 3) if self._load_seconds is not None else None
+            ),
+            "components": {name: dict(info) for name, info in self._components.items()},
+        }
+
     def get_message(self, messageID: int) -> List[ConvoText]:
         """
         Returns messages from the database.
@@ -164,28 +524,116 @@ class MainLoop:
         message = self._data_manager.get_message(messageID)
         return message
 
+    def get_stats(self) -> dict:
+        """
+        Returns how much of its lifetime the loop thread spent idle and busy.
+        """
+        if not self.is_ready():
+            return {"state": self.state, "queue_depth": self.__inference_queue.qsize()}
+        total = time.monotonic() - self._started_at
+        busy = max(0.0, total - self._idle_time)
+        # training figures come from the worker process if there is one
+        training = {
+            "save_seconds": self._classifier.last_save_seconds,
+            "steps_per_second": self._classifier.steps_per_second,
+            "peak_memory_mb": self._classifier.peak_memory_mb,
+        }
+        if self._worker is not None:
+            training.update(self._worker.stats)
+        return {
+            "state": self.state,
+            "queue_depth": self.__inference_queue.qsize(),
+            "idle_seconds": round(self._idle_time, 3),
+            "busy_seconds": round(busy, 3),
+            "utilization": round(busy / total, 4) if total > 0 else 0.0,
+            "gen_tokens_saved_last": self._generator.last_tokens_saved,
+            "gen_tokens_saved_total": self._generator.total_tokens_saved,
+            "cls_save_seconds": round(training["save_seconds"], 3),
+            "cls_steps_per_second": round(training["steps_per_second"], 3),
+            "cls_peak_memory_mb": round(training["peak_memory_mb"], 1),
+            "cls_snapshot_version": self._classifier.snapshot_version,
+            "cls_worker_alive": self._worker is not None and self._worker.is_alive(),
+            "gen_profile": self._generator.controller.last_profile,
+            "gen_latency_p95": round(self._generator.controller.get_p95(), 3),
+        }
+
     async def update(self, patch: LoopPatch) -> LoopPatch:
         """
         Updates the state of the main loop.
+        Requested while loading, the state is applied once loading has finished.
         """
+        if not self.is_ready():
+            self._pending_state = patch.state
+            return LoopPatch(state=self.state)
         self.state = patch.state
         self._enter_state = True
+        self._wake.set()
         return LoopPatch(state=self.state)
 
     async def infer(self, input: ConvoText) -> ConvoText:
         """
         Adds an input to the inference queue and waits for the result to become available.
+        - It registers a future on the calling event loop.
         - It puts the input into the inference queue.
-        - It waits for the result to become available.
-        - Once the result is available, it removes the result from the dictionary and returns it.
+        - It waits until the loop thread resolves the future or INFER_TIMEOUT passes.
+        - Either way, the pending entry is removed before returning.
+        """
+        future = self._register(input)
+        try:
+            # wait for the result to become available and return it
+            return await asyncio.wait_for(future, timeout=config.INFER_TIMEOUT)
+        finally:
+            self._unregister(input, future)
+
+    async def infer_stream(self, input: ConvoText) -> AsyncIterator[ConvoText]:
+        """
+        Like infer() but yields partial responses as they are generated.
+        The last item is the complete response and replaces the partial text.
+        Raises asyncio.TimeoutError if no partial response arrives within INFER_TIMEOUT.
+        """
+        stream: asyncio.Queue[Optional[ConvoText]] = asyncio.Queue()
+        future = self._register(input, stream)
+        try:
+            while True:
+                chunk = await asyncio.wait_for(
+                    stream.get(), timeout=config.INFER_TIMEOUT
+                )
+                if chunk is None:
+                    break
+                yield chunk
+            yield await asyncio.wait_for(future, timeout=config.INFER_TIMEOUT)
+        finally:
+            self._unregister(input, future)
+
+    def _register(
+        self, input: ConvoText, stream: Optional[asyncio.Queue] = None
+    ) -> asyncio.Future:
+        """
+        Registers a future on the calling event loop, queues the input and wakes the loop.
         """
-        # put the input into the queue
-        await self.__inference_queue.put(input)
-        # wait for the result to become available and return it
-        while input.messageID not in self.__results:
-            await asyncio.sleep(0.01)  # Check every 10 ms
-        # return the result and remove it from the dictionary
-        return self.__results.pop(input.messageID)
+        event_loop = asyncio.get_running_loop()
+        future = event_loop.create_future()
+        with self._results_lock:
+            self.__results[(input.convoID, input.messageID)] = (
+                future,
+                event_loop,
+                time.monotonic(),
+                stream,
+            )
+        # put the input into the queue and wake the loop
+        self.__inference_queue.put_nowait(input)
+        self._wake.set()
+        return future
+
+    def _unregister(self, input: ConvoText, future: asyncio.Future) -> None:
+        """
+        Removes the pending entry if the request timed out or was cancelled.
+        """
+        key = (input.convoID, input.messageID)
+        with self._results_lock:
+            pending = self.__results.get(key)
+            if pending is not None and pending[0] is future:
+                del self.__results[key]
 
     # ENTER STATE METHODS #####################################################
     def _enter_training(self) -> None:
@@ -205,6 +653,7 @@ class MainLoop:
         Run every time the loop enters the inference state.
         """
         self._enter_state = False
+        self._auto_training = False
         if config.DEBUG_MSG:
             print("Inference started...")
         # set the models to eval mode
@@ -212,6 +661,17 @@ class MainLoop:
         # update the active split
         self._active_split = self._data_manager.get_split()
 
+    def _enter_auto_training(self) -> None:
+        """
+        Run every time the loop starts training on its own
+        because no inference was requested for LOOP_AUTO_TRAIN_IDLE seconds.
+        """
+        self._auto_training = True
+        if config.DEBUG_MSG:
+            print("Auto training started...")
+        # save new conversations to database
+        self._data_manager.save()
+
     def _enter_epoch(self) -> None:
         """
         Run every time the loop enters the epoch state.
@@ -221,4 +681,7 @@ class MainLoop:
             print("New epoch started...")
         # reload the dataset
         cls_data = self._data_manager.get_cls_data()
-        self._classifier.prepare_training(cls_data)
+        if self._worker is not None:
+            self._worker.submit_epoch(cls_data)
+        else:
+            self._classifier.prepare_training(cls_data)
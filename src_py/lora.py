@@ -0,0 +1,102 @@
+# IMPORT BLOCK ###############################################################
+# Lib Imports
+import math
+from typing import Any, List
+
+import torch
+from torch import nn
+
+# END IMPORT BLOCK ###########################################################
+
+# Low-rank adapters (https://arxiv.org/abs/2106.09685) for the online classifier.
+# The frozen base weight W is extended by a trainable update B @ A of rank r,
+# so only r * (in + out) parameters per adapted layer receive gradients.
+
+
+class LoRALinear(nn.Module):
+    """
+    Wraps a frozen nn.Linear with a trainable low-rank update.
+    """
+
+    def __init__(self, base: nn.Linear, rank: int, alpha: float) -> None:
+        super().__init__()
+        self.base = base
+        self.scaling = alpha / rank
+        self.lora_A = nn.Parameter(
+            torch.empty(rank, base.in_features, device=base.weight.device)
+        )
+        self.lora_B = nn.Parameter(
+            torch.zeros(base.out_features, rank, device=base.weight.device)
+        )
+        # B starts at zero so the adapted layer equals the base layer
+        nn.init.kaiming_uniform_(self.lora_A, a=math.sqrt(5))
+        self.base.weight.requires_grad_(False)
+        if self.base.bias is not None:
+            self.base.bias.requires_grad_(False)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        update = (x @ self.lora_A.t()) @ self.lora_B.t()
+        return self.base(x) + update * self.scaling
+
+    def merged(self) -> nn.Linear:
+        """
+        Returns a plain nn.Linear with the update folded into its weight.
+        """
+        linear = nn.Linear(
+            self.base.in_features,
+            self.base.out_features,
+            bias=self.base.bias is not None,
+            device=self.base.weight.device,
+        )
+        with torch.no_grad():
+            delta = (self.lora_B @ self.lora_A) * self.scaling
+            linear.weight.copy_(self.base.weight + delta)
+            if self.base.bias is not None:
+                linear.bias.copy_(self.base.bias)
+        return linear
+
+
+def apply_lora(
+    model: nn.Module, targets: List[str], trainable: List[str], rank: int, alpha: float
+) -> nn.Module:
+    """
+    Freezes the model, replaces all linear layers whose name ends with one of
+    the targets by LoRALinear and unfreezes modules named in trainable (e.g. the head).
+    """
+    for param in model.parameters():
+        param.requires_grad_(False)
+
+    for name, module in list(model.named_modules()):
+        if isinstance(module, nn.Linear) and name.split(".")[-1] in targets:
+            parent_name, _, child_name = name.rpartition(".")
+            parent = model.get_submodule(parent_name)
+            setattr(parent, child_name, LoRALinear(module, rank, alpha))
+
+    for name, module in model.named_modules():
+        if name.split(".")[-1] in trainable:
+            for param in module.parameters():
+                param.requires_grad_(True)
+    return model
+
+
+def merge_lora(model: nn.Module) -> nn.Module:
+    """
+    Replaces every LoRALinear in the model by its merged nn.Linear (in place).
+    """
+    for name, module in list(model.named_modules()):
+        if isinstance(module, LoRALinear):
+            parent_name, _, child_name = name.rpartition(".")
+            parent = model.get_submodule(parent_name)
+            setattr(parent, child_name, module.merged())
+    return model
+
+
+def lora_state_dict(model: nn.Module) -> dict[str, Any]:
+    """
+    Returns the trainable parameters only (adapters and unfrozen head).
+    """
+    return {
+        name: param.detach().to("cpu", copy=True)
+        for name, param in model.named_parameters()
+        if param.requires_grad
+    }
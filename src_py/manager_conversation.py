@@ -1,9 +1,10 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
 import random
-from typing import List
+from typing import Any, List
 
 # Local Imports
+from . import __backend_config as config
 from .utils import ConvoText, Mood, SpecialTokens
 
 # END IMPORT BLOCK ###########################################################
@@ -12,54 +13,37 @@ from .utils import ConvoText, Mood, SpecialTokens
 class ConvoManager:
     """
     Manages the conversation history and the context, input and response.
-    All methods operate on strings as tokenization is handled by the models directly.
+    History entries are tokenized once with the generator tokenizer so the
+    history can be kept within GEN_HISTORY_MAX_TOKENS without re-encoding.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, tokenizer: Any) -> None:
         # props
+        self.tokenizer = tokenizer
         self.convoID = 0
-        self.history = []
+        self.history: List[str] = []
+        self.history_ids: List[List[int]] = []
         self.current_input = ""
+        self.current_ids: List[int] = []
+        # one context per mood and conversation keeps the prompt prefix stable,
+        # so the generator can reuse the cached key/values of earlier turns
+        self._contexts: dict[Mood, str] = {}
+        self._contexts_convoID: int | None = None
 
     # Public Methods ###########################################################
-    def get_context(self, mood: Mood) -> str:
+    def get_context(self, mood: Mood, convoID: int | None = None) -> str:
         """
         Returns a context string based on the mood.
+        Within a conversation the same mood always returns the same context.
         """
-        FORLANG = [
-            "You don't understand what your friend is saying.",
-            "You are having troubles to understand your friend. Ask for clarification.",
-            "You are confused. What your friend is saying doesn't make sense.",
-        ]
-        NEUTRAL = [
-            "You are having a converation with a friend.",
-            "You are talking to a friend.",
-            "You and a friend are having a conversation.",
-        ]
-        TRUTH = [
-            "You agree with what your friend just said.",
-            "You are happy that your friend said that. Aknlowedge their idea.",
-            "You are positively overwhelmed. Tell them that you agree.",
-        ]
-        DOUBT = [
-            "You are not sure if you agree with what your friend just said.",
-            "You doubt the idea your friend just proposed.",
-            "You are not sure if you agree with your friend.",
-        ]
-        LIE = [
-            "You are very unhappy with what your friend just said. Tell them that you disagree strongly.",
-            "Your friend just lied to you. Tell them you are disappointed in them.",
-            "You are very disappointed in your friend. Tell them that you disagree strongly.",
-        ]
-
-        if mood == Mood.forlang:
-            return random.choice(FORLANG)
-        elif mood == Mood.truth:
-            return random.choice(TRUTH)
-        elif mood == Mood.doubt:
-            return random.choice(DOUBT)
-        elif mood == Mood.lie:
-            return random.choice(LIE)
+        if convoID is not None:
+            if convoID != self._contexts_convoID:
+                self._contexts_convoID = convoID
+                self._contexts = {}
+            if mood not in self._contexts:
+                self._contexts[mood] = self._choose_context(mood)
+            return self._contexts[mood]
+        return self._choose_context(mood)
 
     def get_gen_inference_str(
         self, input: ConvoText, mood=Mood.doubt, context=None
@@ -75,20 +59,23 @@ class ConvoManager:
         if input.convoID != self.convoID:
             self.convoID = input.convoID
             self.history = []
+            self.history_ids = []
 
         # Check if the input is empty
         if input.text == "":
             input.text = self._get_greeting()
 
         # Build the input string
-        self.current_input = (
-            SpecialTokens.context
-            + context
-            + self._get_history()
-            + SpecialTokens.input
-            + input.text
-            + SpecialTokens.response
-        )
+        context_str = SpecialTokens.context + context
+        input_str = SpecialTokens.input + input.text + SpecialTokens.response
+        self.current_input = "".join([context_str, self._get_history(), input_str])
+
+        # Build the input ids from the already encoded history
+        self.current_ids = [
+            *self._encode(context_str),
+            *[token_id for entry in self.history_ids for token_id in entry],
+            *self._encode(input_str),
+        ]
 
         # Update the history with the input
         self._update_history(input.text)
@@ -103,39 +90,106 @@ class ConvoManager:
         filtered = response.replace(self.current_input, "").replace(
             SpecialTokens.endseq, ""
         )
+        # generation stops when the model starts the next input
+        filtered = filtered.partition(SpecialTokens.input)[0]
         processed = self._postprocess(filtered)
         # if config.DEBUG_MSG:
         #     print(f"Filtered result:\n {processed}")
         self._update_history(processed)
         return processed
 
+    def filter_partial(self, text: str, final: bool = False) -> str:
+        """
+        Filters a partially generated response (without the prompt).
+        Until the generation is final the text is released up to the last
+        whitespace, so no word is sent incomplete. The final text may still
+        be cut back to a full sentence, the complete response replaces it.
+        """
+        filtered = text.replace(SpecialTokens.endseq, "")
+        filtered = filtered.partition(SpecialTokens.input)[0]
+        if final:
+            return self._postprocess(filtered)
+        end_position = max(filtered.rfind(" "), filtered.rfind("\n"))
+        if end_position == -1:
+            return ""
+        return filtered[:end_position].strip()
+
     # END Public Methods #######################################################
 
     # PRIVATE METHODS ##########################################################
 
+    def _choose_context(self, mood: Mood) -> str:
+        """
+        Returns a random context string for the mood.
+        """
+        FORLANG = [
+            "You don't understand what your friend is saying.",
+            "You are having troubles to understand your friend. Ask for clarification.",
+            "You are confused. What your friend is saying doesn't make sense.",
+        ]
+        NEUTRAL = [
+            "You are having a converation with a friend.",
+            "You are talking to a friend.",
+            "You and a friend are having a conversation.",
+        ]
+        TRUTH = [
+            "You agree with what your friend just said.",
+            "You are happy that your friend said that. Aknlowedge their idea.",
+            "You are positively overwhelmed. Tell them that you agree.",
+        ]
+        DOUBT = [
+            "You are not sure if you agree with what your friend just said.",
+            "You doubt the idea your friend just proposed.",
+            "You are not sure if you agree with your friend.",
+        ]
+        LIE = [
+            "You are very unhappy with what your friend just said. Tell them that you disagree strongly.",
+            "Your friend just lied to you. Tell them you are disappointed in them.",
+            "You are very disappointed in your friend. Tell them that you disagree strongly.",
+        ]
+
+        if mood == Mood.forlang:
+            return random.choice(FORLANG)
+        elif mood == Mood.truth:
+            return random.choice(TRUTH)
+        elif mood == Mood.doubt:
+            return random.choice(DOUBT)
+        elif mood == Mood.lie:
+            return random.choice(LIE)
+
     def _update_history(self, append: str) -> None:
         """
         Updates the conversation history with the new input.
+        The oldest input/response pairs are dropped while the history exceeds GEN_HISTORY_MAX_TOKENS.
         """
+        if len(self.history) % 2 == 0:
+            token = SpecialTokens.input
+        else:
+            token = SpecialTokens.response
         self.history.append(append)
+        self.history_ids.append(self._encode(token + append))
+
+        # drop pairs so the history keeps starting with an input
+        total = sum(len(ids) for ids in self.history_ids)
+        while total > config.GEN_HISTORY_MAX_TOKENS and len(self.history) > 2:
+            total -= len(self.history_ids[0]) + len(self.history_ids[1])
+            del self.history[:2]
+            del self.history_ids[:2]
 
     def _get_history(self) -> str:
         """
         Returns the conversation history as a single string with input and response tokens alternating.
         """
+        return "".join(
+            (SpecialTokens.input if i % 2 == 0 else SpecialTokens.response) + entry
+            for i, entry in enumerate(self.history)
+        )
 
-        # Initialize an empty string to store the concatenated history
-        concatenated_history = ""
-
-        # Iterate through the history array
-        for i, entry in enumerate(self.history):
-            # Determine which token to use based on whether the index is even or odd
-            token = SpecialTokens.input if i % 2 == 0 else SpecialTokens.response
-
-            # Append the token and entry to the concatenated_history
-            concatenated_history += token + entry
-
-        return concatenated_history
+    def _encode(self, text: str) -> List[int]:
+        """
+        Returns the token ids of a text without any added special tokens.
+        """
+        return self.tokenizer.encode(text, add_special_tokens=False)
 
     def _postprocess(self, text: str) -> str:
         """
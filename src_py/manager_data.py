@@ -1,10 +1,17 @@
 # IMPORT BLOCK ###############################################################
 # Lib Imports
+import bisect
+import copy
+import json
 import os
 import random
-from typing import List
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Tuple
 
-from datasets import DatasetDict, disable_caching
+import numpy as np
+import pyarrow as pa
+from datasets import Dataset, DatasetDict, concatenate_datasets, disable_caching
 
 # Local Imports
 from . import __backend_config as config
@@ -15,37 +22,63 @@ from .utils import (
     InterData,
     Mood,
     remove_folder,
+    write_arrow_table,
 )
 
 # END IMPORT BLOCK ###########################################################
 
 
 class DataManager:
+    """
+    Holds the conversation database.\n
+    On disk it consists of a base DatasetDict plus small append-only Arrow
+    segments with the rows added since, both listed in a manifest.
+    Segments are written off the loop thread and compacted into a new base
+    once a split has more than DATA_MAX_SEGMENTS of them.
+    """
+
     # Paths
     data_path: str
-    active_path: str
     fallback_path: str
+    segment_path: str
+    manifest_path: str
 
     # Data
     database: DatasetDict
+    _buffer: dict[str, List[dict]]
+    _unsaved: dict[str, List[dict]]
+    _manifest: dict
+    _epoch_cls: dict[str, np.ndarray]
+
+    # Index
+    _index: dict[Tuple[int, int], Tuple[str, int]]
+    _conversations: dict[int, Tuple[int, int]]
+    _order: List[Tuple[int, int]]
 
     def __init__(self) -> None:
         disable_caching()
+        self._lock = threading.RLock()
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._save_future: Future | None = None
         self._setup_paths()
         self._load_database()
+        self._buffer = {split: [] for split in self.database.keys()}
+        self._unsaved = {split: [] for split in self.database.keys()}
+        self._build_index()
+        self._load_epoch_counters()
+        self._last_cls_rows: np.ndarray | None = None
 
     # PUBLIC METHODS  ###########################################################
     def get_message(self, conID: int) -> List[ConvoText]:
         """
-        Returns the ConvoText object with the given msgID.
+        Returns input and response of the message at position -conID
+        in the database ordered by conID and msgID (1 is the latest message).
         """
-        sorted = self.database.sort("conID")
-        highest_train_datapoint = sorted["train"][-conID]
-        highest_test_datapoint = sorted["test"][-conID]
-        if highest_train_datapoint["conID"] > highest_test_datapoint["conID"]:
-            datapoint = highest_train_datapoint
-        else:
-            datapoint = highest_test_datapoint
+        with self._lock:
+            if not 0 < conID <= len(self._order):
+                raise IndexError(f"No message at position -{conID}")
+            split, row = self._index[self._order[-conID]]
+            datapoint = self._get_row(split, row)
 
         interdata = InterData(**datapoint)
         input = ConvoText(
@@ -66,6 +99,13 @@ class DataManager:
         )
         return [input, response]
 
+    def get_message_range(self, conID: int) -> Tuple[int, int] | None:
+        """
+        Returns the first and last msgID of a conversation or None if it is unknown.
+        """
+        with self._lock:
+            return self._conversations.get(conID)
+
     def get_datapoint(self, input: ConvoText) -> InterData:
         datapoint = InterData(
             timestamp=input.timestamp,
@@ -106,18 +146,55 @@ class DataManager:
         return selected_split
 
     def add(self, datapoint: InterData, split: str) -> None:
-        self.database[split] = self.database[split].add_item(datapoint.dict())  # type: ignore
-        if config.DEBUG_MSG:
-            print(f"Added datapoint to split {split}:\n{self.database[split][-1]}")
+        """
+        Appends a datapoint to the in-memory buffer of a split.
+        The buffer is merged into the dataset in bulk once it holds DATA_BUFFER_MAX rows
+        or when the dataset is read or saved.
+        """
+        row = datapoint.dict()
+        row["mood"] = str(datapoint.mood)
+        with self._lock:
+            self._buffer[split].append(row)
+            self._unsaved[split].append(row)
+            position = len(self.database[split]) + len(self._buffer[split]) - 1
+            self._index_row(datapoint.conID, datapoint.msgID, split, position)
+            if config.DEBUG_MSG:
+                print(f"Added datapoint to split {split}:\n{row}")
+            if len(self._buffer[split]) >= config.DATA_BUFFER_MAX:
+                self._flush()
 
         # TODO: For every datapoint added, remove the oldest datapoint from the same split
 
     def save(self) -> None:
-        # save to disk
-        path = os.path.join(self.data_path, get_timestamp())
-        self.database.save_to_disk(path)
-        if config.DEBUG_MSG:
-            print("Database saved to:", path)
+        """
+        Writes the rows added since the last save as new segments
+        together with the current epoch counters.
+        Writing happens in the background, the manifest is swapped atomically
+        once all segments are on disk.
+        The previous save is finished first, so rows it hands back after
+        a failed write are written again in their original order.
+        """
+        self.wait_for_save()
+        with self._lock:
+            rows = self._unsaved
+            self._unsaved = {split: [] for split in self.database.keys()}
+            schemas = {
+                split: self.database[split].features.arrow_schema
+                for split in self.database.keys()
+            }
+            counters = {
+                split: counts.copy() for split, counts in self._epoch_cls.items()
+            }
+        self._save_future = self._writer.submit(
+            self._save_segments, rows, schemas, counters
+        )
+
+    def wait_for_save(self) -> None:
+        """
+        Blocks until the last background save has finished.
+        """
+        if self._save_future is not None:
+            self._save_future.result()
 
     # def get_gen_data(self) -> DatasetDict:
     #     gen_train = self.database["train"].sort("epoch_gen")
@@ -127,58 +204,264 @@ class DataManager:
 
     def get_cls_data(self) -> DatasetDict:
         """
-        Returns a DatasetDict containing all entries with the minimal epoch_cls value.
-        """
-        # XXX Could not get that to work using random indices instead
-        # # get minimal epoch_cls value in database
-        # min_epoch = min(self.database["train"]["epoch_cls"])
-        # # get indices of all entries with minimal epoch_cls value
-        # indices = [
-        #     idx
-        #     for idx, epoch in enumerate(self.database["train"]["epoch_cls"])
-        #     if epoch == min_epoch
-        # ]
-        # # get all entries with minimal epoch_cls value
-        # cls_train = self.database["train"].select(indices)
-
-        # # Add 1 to epoch_cls value of all entries in indices
-        # def advance_epoch_cls(batch, idx):
-        #     for i in range(len(batch["epoch_cls"])):
-        #         if [idx[i]] in indices:
-        #             batch["epoch_cls"][i] += 1
-        #     return batch
-
-        # self.database["train"] = self.database["train"].map(
-        #     advance_epoch_cls, with_indices=True, batched=True
-        # )
-
-        # print(
-        #     self.database["train"].filter(
-        #         lambda example: example["epoch_cls"] == min_epoch + 1  # type: ignore
-        #     )
-        # )
-
-        # print(
-        #     self.database["train"].filter(
-        #         lambda example: example["epoch_cls"] == min_epoch + 1  # type: ignore
-        #     )["epoch_cls"][0:10]
-        # )
-
-        train_indices = random.sample(
-            range(len(self.database["train"])), config.CLS_EPOCH_SIZE
-        )
-        test_indices = random.sample(
-            range(len(self.database["test"])), int(config.CLS_EPOCH_SIZE * 0.2)
-        )
-        cls_train = self.database["train"].select(train_indices)
-        cls_test = self.database["test"].select(test_indices)
-        cls_train = cls_train.shuffle()
+        Returns a DatasetDict with CLS_EPOCH_SIZE training rows,
+        preferring the rows with the lowest epoch_cls counter (ties are random).
+        The counters of the selected rows are advanced in memory only.
+        """
+        with self._lock:
+            self._flush()
+            counts = self._get_epoch_counters("train")
+
+            # argpartition on counter + random jitter picks the least trained rows
+            size = min(config.CLS_EPOCH_SIZE, len(counts))
+            keys = counts + np.random.random(len(counts))
+            train_indices = np.sort(np.argpartition(keys, size - 1)[:size])
+            counts[train_indices] += 1
+            self._last_cls_rows = train_indices
+
+            test_indices = random.sample(
+                range(len(self.database["test"])), int(config.CLS_EPOCH_SIZE * 0.2)
+            )
+            # sorted indices keep select cheap, the training sampler shuffles
+            cls_train = self.database["train"].select(train_indices)
+            cls_test = self.database["test"].select(sorted(test_indices))
+
+        if config.DEBUG_MSG:
+            least = int(counts[train_indices].min()) - 1
+            print(f"Epoch rows were trained at least {least} times before")
         cls_epoch = DatasetDict({"train": cls_train, "test": cls_test})
         return cls_epoch
 
+    def revert_cls_data(self) -> None:
+        """
+        Takes back the counter increments of the last get_cls_data() call
+        for an epoch that was never trained.
+        """
+        with self._lock:
+            if self._last_cls_rows is None:
+                return
+            counts = self._get_epoch_counters("train")
+            rows = self._last_cls_rows
+            counts[rows] = np.maximum(counts[rows] - 1, 0)
+            self._last_cls_rows = None
+
     # END PUBLIC METHODS #######################################################
 
     # PRIVATE METHODS ##########################################################
+    def _flush(self) -> None:
+        """
+        Merges the buffered rows into the dataset with one concat per split.
+        """
+        with self._lock:
+            for split, rows in self._buffer.items():
+                if not rows:
+                    continue
+                features = self.database[split].features
+                appended = Dataset.from_list(rows, features=features)
+                self.database[split] = concatenate_datasets(
+                    [self.database[split], appended]
+                )
+                if config.DEBUG_MSG:
+                    print(f"Merged {len(rows)} buffered rows into split {split}")
+                self._buffer[split] = []
+
+    def _build_index(self) -> None:
+        """
+        Indexes all rows by (conID, msgID) once after loading.
+        """
+        self._index = {}
+        self._conversations = {}
+        self._order = []
+        for split in self.database.keys():
+            con_ids = self.database[split]["conID"]
+            msg_ids = self.database[split]["msgID"]
+            for row, key in enumerate(zip(con_ids, msg_ids)):
+                if key not in self._index:
+                    self._order.append(key)
+                self._index[key] = (split, row)
+                self._update_conversation(*key)
+        self._order.sort()
+        if config.DEBUG_MSG:
+            print(f"Indexed {len(self._order)} messages")
+
+    def _index_row(self, conID: int, msgID: int, split: str, row: int) -> None:
+        """
+        Adds a single row to the index.
+        """
+        key = (conID, msgID)
+        if key not in self._index:
+            # new messages usually go to the end, which keeps this cheap
+            if not self._order or key > self._order[-1]:
+                self._order.append(key)
+            else:
+                bisect.insort(self._order, key)
+        self._index[key] = (split, row)
+        self._update_conversation(conID, msgID)
+
+    def _update_conversation(self, conID: int, msgID: int) -> None:
+        """
+        Extends the msgID range of a conversation.
+        """
+        first, last = self._conversations.get(conID, (msgID, msgID))
+        self._conversations[conID] = (min(first, msgID), max(last, msgID))
+
+    def _get_row(self, split: str, row: int) -> dict:
+        """
+        Returns a row of a split, which may still be buffered.
+        """
+        stored = len(self.database[split])
+        if row < stored:
+            return self.database[split][row]
+        return self._buffer[split][row - stored]
+
+    def _load_epoch_counters(self) -> None:
+        """
+        Reads the epoch_cls column once and overlays the counters saved since.
+        """
+        self._epoch_cls = {}
+        for split in self.database.keys():
+            column = self.database[split].with_format("numpy")["epoch_cls"]
+            counts = np.asarray(column, dtype=np.int32)
+            name = self._manifest.get("epoch_cls", {}).get(split)
+            if name is not None:
+                path = os.path.join(self.segment_path, name)
+                if os.path.exists(path):
+                    saved = np.load(path)[: len(counts)]
+                    counts[: len(saved)] = saved
+            self._epoch_cls[split] = counts
+
+    def _get_epoch_counters(self, split: str) -> np.ndarray:
+        """
+        Returns the counters of a split, grown to cover rows merged since.
+        """
+        counts = self._epoch_cls[split]
+        missing = len(self.database[split]) - len(counts)
+        if missing > 0:
+            counts = np.concatenate([counts, np.zeros(missing, dtype=np.int32)])
+            self._epoch_cls[split] = counts
+        return counts
+
+    def _save_segments(
+        self, rows: dict[str, List[dict]], schemas: dict, counters: dict
+    ) -> None:
+        """
+        Runs on the writer thread. Logs a failed write and puts its rows back
+        in front of the unsaved rows, before the future is marked done.
+        """
+        try:
+            self._write_segments(rows, schemas, counters)
+        except Exception as e:
+            print("Saving the database failed, rows are kept for the next save:", e)
+            with self._lock:
+                for split, split_rows in rows.items():
+                    self._unsaved[split] = split_rows + self._unsaved[split]
+
+    def _write_segments(
+        self, rows: dict[str, List[dict]], schemas: dict, counters: dict
+    ) -> None:
+        """
+        Runs on the writer thread. Writes one segment per split
+        and the epoch counters, then swaps the manifest.
+        """
+        manifest = copy.deepcopy(self._manifest)
+        old_counters = manifest.get("epoch_cls", {})
+        stamp = get_timestamp()
+        for split, split_rows in rows.items():
+            if not split_rows:
+                continue
+            name = f"{split}-{stamp}.arrow"
+            table = pa.Table.from_pylist(split_rows, schema=schemas[split])
+            write_arrow_table(table, os.path.join(self.segment_path, name))
+            manifest["segments"].setdefault(split, []).append(name)
+        manifest["epoch_cls"] = {}
+        for split, counts in counters.items():
+            name = f"epoch_cls-{split}-{stamp}.npy"
+            path = os.path.join(self.segment_path, name)
+            np.save(path + ".tmp.npy", counts)
+            os.replace(path + ".tmp.npy", path)
+            manifest["epoch_cls"][split] = name
+        self._write_manifest(manifest)
+        if config.DEBUG_MSG:
+            print("Database segments saved:", manifest["segments"])
+
+        # previous counters are read into memory on load, never mapped
+        for name in old_counters.values():
+            try:
+                os.remove(os.path.join(self.segment_path, name))
+            except OSError:
+                pass
+
+        # the rows are saved at this point, a failed compaction is retried later
+        if any(
+            len(names) > config.DATA_MAX_SEGMENTS
+            for names in manifest["segments"].values()
+        ):
+            try:
+                self._compact(counters)
+            except Exception as e:
+                print("Compacting the database failed:", e)
+
+    def _compact(self, counters: dict) -> None:
+        """
+        Runs on the writer thread. Merges base and segments into a new base
+        and writes the epoch counters back into the epoch_cls column.
+        Files that are still memory-mapped are removed at the next start.
+        """
+        old_manifest = self._manifest
+        base = self._load_manifest_database(old_manifest)
+        for split, counts in counters.items():
+            column = np.asarray(base[split].with_format("numpy")["epoch_cls"])
+            column[: len(counts)] = counts[: len(column)]
+            features = base[split].features
+            base[split] = base[split].remove_columns("epoch_cls")
+            base[split] = base[split].add_column("epoch_cls", column.tolist())
+            base[split] = base[split].cast(features)
+
+        name = "compact-" + get_timestamp()
+        path = os.path.join(self.data_path, name)
+        base.save_to_disk(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._write_manifest({"base": name, "segments": {}})
+        if config.DEBUG_MSG:
+            print("Database compacted to:", path)
+
+        # best effort, the live database may still map these files
+        try:
+            for names in old_manifest["segments"].values():
+                for segment in names:
+                    os.remove(os.path.join(self.segment_path, segment))
+            for name in old_manifest.get("epoch_cls", {}).values():
+                os.remove(os.path.join(self.segment_path, name))
+            if old_manifest["base"] != config.DATA_SUB_PROTECTED:
+                remove_folder(os.path.join(self.data_path, old_manifest["base"]))
+        except OSError:
+            pass
+
+    def _write_manifest(self, manifest: dict) -> None:
+        """
+        Replaces the manifest atomically,
+        so a crash leaves either the old or the new one.
+        """
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        self._manifest = manifest
+
+    def _read_manifest(self) -> dict | None:
+        """
+        Returns the manifest or None if there is no valid one.
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if "base" in manifest and "segments" in manifest:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return None
+
     def _setup_paths(self) -> None:
         # check if data folder exists
         self.data_path = os.path.join(get_resource_path(), *config.DATA_PATH)
@@ -186,62 +469,135 @@ class DataManager:
             raise Exception("Data folder not found. Please contact the developer.")
 
         # check if base folder exists
-        self.fallback_path = os.path.join(self.data_path, "base")
+        self.fallback_path = os.path.join(self.data_path, config.DATA_SUB_PROTECTED)
         if not os.path.exists(self.fallback_path):
             raise Exception("Base data folder not found. Please contact the developer.")
 
-        # look for subfolders
-        subfoldernames = os.listdir(self.data_path)
-        subfolders = []
-        for name in subfoldernames:
-            subfolders.append(os.path.join(self.data_path, name))
+        # segments and manifest live next to the base folder
+        self.segment_path = os.path.join(self.data_path, config.DATA_SUB_SEGMENTS)
+        os.makedirs(self.segment_path, exist_ok=True)
+        self.manifest_path = os.path.join(self.data_path, config.DATA_MANIFEST)
 
-        if len(subfolders) <= 1:
-            self.active_path = os.path.join(self.data_path, get_timestamp())
-            os.mkdir(self.active_path)
-        else:
-            # get most recent subfolder
-            subfolders.sort(key=lambda x: os.path.getmtime(x))
-            self.active_path = subfolders[-1]  # last element is the most recent
+    def _get_legacy_base(self) -> str:
+        """
+        Returns the most recent full copy saved before segments were introduced
+        or the protected base folder if there is none.
+        """
+        subfolders = [
+            entry.path
+            for entry in os.scandir(self.data_path)
+            if entry.is_dir()
+            and entry.name not in (config.DATA_SUB_PROTECTED, config.DATA_SUB_SEGMENTS)
+            and os.path.exists(os.path.join(entry.path, "dataset_dict.json"))
+        ]
+        if not subfolders:
+            return config.DATA_SUB_PROTECTED
+        subfolders.sort(key=lambda x: os.path.getmtime(x))
+        return os.path.basename(subfolders[-1])  # last element is the most recent
+
+    def _load_manifest_database(self, manifest: dict) -> DatasetDict:
+        """
+        Memory-maps the base of a manifest and appends its segments.
+        """
+        base_path = os.path.join(self.data_path, manifest["base"])
+        base = DatasetDict.load_from_disk(base_path)
+        database = {}
+        for split in base.keys():
+            parts = [base[split]]
+            for name in manifest["segments"].get(split, []):
+                path = os.path.join(self.segment_path, name)
+                if not os.path.exists(path):
+                    print("Database segment is missing and skipped:", path)
+                    continue
+                parts.append(Dataset.from_file(path))
+            if len(parts) > 1:
+                database[split] = concatenate_datasets(parts)
+            else:
+                database[split] = parts[0]
+        return DatasetDict(database)
 
     def _load_database(self) -> None:
-        path: str
+        manifest = self._read_manifest()
+        if manifest is None:
+            manifest = {"base": self._get_legacy_base(), "segments": {}}
+
         try:
-            self.database = DatasetDict.load_from_disk(self.active_path)
-            path = self.active_path
-        except:
+            self.database = self._load_manifest_database(manifest)
+            fallback = False
+        except Exception as e:
+            print("Database could not be loaded, falling back to base:", e)
+            failed = manifest
+            manifest = {"base": config.DATA_SUB_PROTECTED, "segments": {}}
             try:
-                self.database = DatasetDict.load_from_disk(self.fallback_path)
-                path = self.fallback_path
+                self.database = self._load_manifest_database(manifest)
             except Exception as e:
                 raise Exception(
                     "The base datapath was moved or deleted. Please contact the developer.\nError: "
                     + str(e)
                 )
+            fallback = True
 
         if config.DEBUG_MSG:
-            print("Database loaded from:", path)
+            print("Database loaded from:", manifest)
 
-        self._cleanup_datapath()
+        # the unloadable data is kept aside instead of being cleaned up
+        if fallback:
+            self._set_aside(failed)
+        self._write_manifest(manifest)
+        if not fallback:
+            self._cleanup_datapath()
 
-    def _cleanup_datapath(self) -> None:
-        folders = 0
+    def _set_aside(self, manifest: dict) -> None:
+        """
+        Moves the base folder and segments of a manifest that failed to load
+        to DATA_SUB_RECOVERED, where the cleanup does not touch them.
+        """
+        target = os.path.join(
+            self.data_path, config.DATA_SUB_RECOVERED, get_timestamp()
+        )
+        os.makedirs(os.path.join(target, config.DATA_SUB_SEGMENTS), exist_ok=True)
 
-        subfoldernames = os.listdir(self.data_path)
-        subfolders = []
-        for name in subfoldernames:
-            if name == config.DATA_SUB_PROTECTED:
-                continue
-            subfolders.append(os.path.join(self.data_path, name))
+        base = manifest["base"]
+        base_path = os.path.join(self.data_path, base)
+        if base != config.DATA_SUB_PROTECTED and os.path.isdir(base_path):
+            os.replace(base_path, os.path.join(target, base))
 
-        subfolders.sort(key=lambda x: os.path.getmtime(x))
+        names = [name for names in manifest["segments"].values() for name in names]
+        names += list(manifest.get("epoch_cls", {}).values())
+        for name in names:
+            path = os.path.join(self.segment_path, name)
+            if os.path.exists(path):
+                os.replace(path, os.path.join(target, config.DATA_SUB_SEGMENTS, name))
+        print("Data that failed to load was moved to:", target)
+
+    def _cleanup_datapath(self) -> None:
+        """
+        Removes folders, segments and temporary files not listed in the manifest.
+        """
+        removed = 0
+
+        keep = {
+            config.DATA_SUB_PROTECTED,
+            config.DATA_SUB_SEGMENTS,
+            config.DATA_SUB_TOKENS,
+            config.DATA_SUB_RECOVERED,
+            self._manifest["base"],
+        }
+        for entry in os.scandir(self.data_path):
+            if entry.is_dir() and entry.name not in keep:
+                remove_folder(entry.path)
+                removed += 1
 
-        if len(subfolders) > config.MAX_DATA_FOLDERS:
-            for folder in subfolders[: -config.MAX_DATA_FOLDERS]:
-                remove_folder(os.path.join(self.data_path, folder))
-                folders += 1
+        segments = {
+            name for names in self._manifest["segments"].values() for name in names
+        }
+        segments.update(self._manifest.get("epoch_cls", {}).values())
+        for entry in os.scandir(self.segment_path):
+            if entry.name not in segments:
+                os.remove(entry.path)
+                removed += 1
 
         if config.DEBUG_MSG:
-            print(f"Data folder cleanup complete.\nRemoved {folders} folders.")
+            print(f"Data folder cleanup complete.\nRemoved {removed} entries.")
 
     # END PRIVATE METHODS ######################################################
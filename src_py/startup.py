@@ -0,0 +1,182 @@
+# IMPORT BLOCK ###############################################################
+# Lib Imports
+import asyncio
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Optional
+
+import psutil
+
+# Local Imports
+from . import __backend_config as config
+from .utils import setup_env, setup_threads
+
+# the loop module imports torch, transformers and datasets
+if TYPE_CHECKING:
+    from .loop import MainLoop
+
+# END IMPORT BLOCK ###########################################################
+
+
+class LoopHandle:
+    """
+    Imports the ML stack and creates the MainLoop in a background thread,
+    so FastAPI can answer requests while torch & co. are still importing.
+    """
+
+    def __init__(self) -> None:
+        self.loop: Optional["MainLoop"] = None
+        self.import_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._created = threading.Event()
+        self._thread = threading.Thread(target=self._create, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    async def get(self) -> Optional["MainLoop"]:
+        """
+        Returns the loop once its components are loaded, waiting up to
+        INFER_TIMEOUT for the import and loading phase together.
+        Returns None if it is not ready by then or failed to start.
+        """
+        if self.loop is not None and self.loop.is_ready():
+            return self.loop
+        ready = await asyncio.get_running_loop().run_in_executor(
+            None, self._wait_ready, config.INFER_TIMEOUT
+        )
+        return self.loop if ready else None
+
+    def _wait_ready(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        self._created.wait(timeout)
+        if self.loop is None:
+            return False
+        return self.loop.wait_ready(max(0.0, deadline - time.monotonic()))
+
+    def get_status(self) -> dict:
+        """
+        Returns the status of the loop, or the import phase if it does not exist yet.
+        """
+        if self.loop is None:
+            status = {
+                "state": "error" if self.error is not None else "loading",
+                "ready": False,
+                "load_seconds": None,
+                "components": {},
+                "error": self.error,
+            }
+        else:
+            status = self.loop.get_status()
+        status["import_seconds"] = self.import_seconds
+        return status
+
+    def _create(self) -> None:
+        start = time.monotonic()
+        try:
+            # thread counts apply before torch does any parallel work,
+            # affinity and environment were set by main() (see setup_env)
+            setup_threads()
+            from .loop import MainLoop
+
+            self.import_seconds = round(time.monotonic() - start, 3)
+            if config.DEBUG_MSG:
+                print(f"ML stack imported in {self.import_seconds:.2f}s")
+            loop = MainLoop()
+            loop.start()
+            self.loop = loop
+        except Exception as e:
+            print("Creating the main loop failed:", e)
+            self.error = str(e)
+        finally:
+            self._created.set()
+
+
+class ImportProfiler:
+    """
+    Measures the time spent importing every module while active.\n
+    Only imports that load new modules are counted. Self time excludes
+    nested imports, so self times add up to the total import time.
+    Submodules loaded by a from-import count towards the imported package.
+    """
+
+    def __init__(self) -> None:
+        self.cumulative: defaultdict[str, float] = defaultdict(float)
+        self.self_time: defaultdict[str, float] = defaultdict(float)
+        self.total = 0.0
+        self._stack: list[float] = []
+        self._original = builtins.__import__
+
+    def __enter__(self) -> "ImportProfiler":
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        builtins.__import__ = self._original
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        before = len(sys.modules)
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if len(sys.modules) > before:
+                module = self._resolve(name, globals, level)
+                self.cumulative[module] += elapsed
+                self.self_time[module] += elapsed - nested
+                if self._stack:
+                    self._stack[-1] += elapsed
+                else:
+                    self.total += elapsed
+
+    def _resolve(self, name: str, globals: Any, level: int) -> str:
+        if level == 0 or not globals:
+            return name
+        try:
+            return importlib.util.resolve_name(
+                "." * level + name, globals.get("__package__")
+            )
+        except (ImportError, ValueError):
+            return name
+
+    def report(self, top: int = 25) -> str:
+        """
+        Returns the slowest modules and the import time per top-level package.
+        """
+        packages: defaultdict[str, float] = defaultdict(float)
+        for module, seconds in self.self_time.items():
+            packages[module.split(".")[0]] += seconds
+        slowest = sorted(self.cumulative.items(), key=lambda x: x[1], reverse=True)
+
+        lines = [f"Imported {len(self.cumulative)} modules in {self.total:.3f}s"]
+        lines.append(f"\nSlowest modules (cumulative / self seconds, top {top}):")
+        for module, seconds in slowest[:top]:
+            lines.append(f"  {seconds:8.3f} {self.self_time[module]:8.3f}  {module}")
+        lines.append("\nPer package (self seconds):")
+        for package, seconds in sorted(
+            packages.items(), key=lambda x: x[1], reverse=True
+        )[:top]:
+            lines.append(f"  {seconds:8.3f}  {package}")
+        return "\n".join(lines)
+
+
+def profile_startup() -> None:
+    """
+    Prints how long the process took to reach this point (interpreter and
+    server imports) and a per-module breakdown of importing the ML stack.
+    """
+    before_main = time.time() - psutil.Process().create_time()
+    with ImportProfiler() as profiler:
+        setup_env()
+        setup_threads()
+        from .loop import MainLoop  # noqa: F401
+
+    print(f"Process start until profiling: {before_main:.3f}s")
+    print(profiler.report())
@@ -2,24 +2,121 @@
 # Lib Imports
 import datetime
 import os, sys
-import torch
+import psutil
 from bidict import bidict
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 from enum import Enum
 
+# torch and pyarrow are imported where they are used,
+# so importing this module does not pull in the ML stack (see startup.py)
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import torch
+
+# Local Imports
+from . import __backend_config as config
+
 # END IMPORT BLOCK ###########################################################
 
 
+# torch's own intra-op thread count, restored for a role without a setting
+_default_threads: Optional[int] = None
+
+
 # FUNCTION BLOCK #############################################################
-def setup_env() -> None:
+def setup_env(role: str = "serve") -> None:
     """
     Sets up environment variables to prevent unnecessary warnings\n
-    which are not supported by the hardware.
+    which are not supported by the hardware.\n
+    Pins the process to the CPU affinity of the role ("serve" or "train").
+    Must run on the main thread before any other thread is started,
+    threads created earlier keep the full CPU mask on Linux.
     """
     # Prevent triton warning
     os.environ["XFORMERS_FORCE_DISABLE_TRITON"] = "1"
+    os.environ["TOKENIZERS_PARALLELISM"] = str(config.TOKENIZERS_PARALLELISM).lower()
+
+    affinity = (
+        config.TRAIN_CPU_AFFINITY if role == "train" else config.SERVE_CPU_AFFINITY
+    )
+    if affinity is not None:
+        try:
+            psutil.Process().cpu_affinity(affinity)
+        except (AttributeError, ValueError, psutil.Error) as e:
+            # not supported on macOS
+            print("CPU affinity could not be set:", e)
+
+
+def setup_threads(role: str = "serve") -> None:
+    """
+    Applies the torch thread counts of the role and prints the resulting layout.
+    Must run before the models are loaded.
+    """
+    import torch
+
+    global _default_threads
+    if _default_threads is None:
+        _default_threads = torch.get_num_threads()
+
+    interop = (
+        config.TRAIN_INTEROP_THREADS
+        if role == "train"
+        else config.SERVE_INTEROP_THREADS
+    )
+    if interop is not None:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError as e:
+            # only possible before the first parallel work
+            print("Inter-op threads could not be set:", e)
+    use_threads(role)
+    print(get_resource_report(role))
+
+
+def use_threads(role: str) -> None:
+    """
+    Sets the torch intra-op threads of the serving or training path,
+    or torch's default if the role has no setting.
+    Cheap if the count does not change, so the loop calls it per phase.
+    """
+    import torch
+
+    global _default_threads
+    if _default_threads is None:
+        _default_threads = torch.get_num_threads()
+
+    threads = config.TRAIN_THREADS if role == "train" else config.SERVE_THREADS
+    if threads is None:
+        threads = _default_threads
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+def get_resource_report(role: str) -> str:
+    """
+    Returns the effective thread and core layout of this process.
+    """
+    import torch
+
+    try:
+        cores = psutil.Process().cpu_affinity()
+    except AttributeError:
+        cores = None
+    return "\n".join(
+        [
+            f"Resources ({role}, pid {os.getpid()}):",
+            f"  cpus: {psutil.cpu_count(logical=False)} physical, "
+            f"{psutil.cpu_count()} logical",
+            f"  affinity: {cores if cores is not None else 'not supported'}",
+            f"  torch threads: {torch.get_num_threads()} intra-op, "
+            f"{torch.get_num_interop_threads()} inter-op",
+            f"  serve threads: {config.SERVE_THREADS or 'default'}, "
+            f"train threads: {config.TRAIN_THREADS or 'default'}",
+            f"  tokenizers parallelism: {os.environ['TOKENIZERS_PARALLELISM']}",
+        ]
+    )
 
 
 def get_resource_path() -> str:
@@ -33,11 +130,13 @@ def get_resource_path() -> str:
         return os.path.join(os.getcwd(), "resources")
 
 
-def get_cuda() -> torch.device:
+def get_cuda() -> "torch.device":
     """
     Returns the device to use for training\n
     (GPU if available, CPU otherwise)
     """
+    import torch
+
     if torch.cuda.is_available():
         print("CUDA available, using GPU")
         return torch.device("cuda")
@@ -46,6 +145,73 @@ def get_cuda() -> torch.device:
         return torch.device("cpu")
 
 
+def get_quantized_model(load: Callable[[], Any], source_path: str, name: str) -> Any:
+    """
+    Returns a copy of a model with its linear layers dynamically quantized to int8.\n
+    The quantized model is cached in MODEL_ROOT/quantized and only rebuilt
+    if the files in source_path or the torch / transformers versions changed
+    since it was cached, or if the cache cannot be loaded.
+    """
+    import torch
+    import transformers
+
+    cache_dir = os.path.join(get_resource_path(), *config.MODEL_ROOT, "quantized")
+    cache_path = os.path.join(cache_dir, name + ".pt")
+    stamp_path = os.path.join(cache_dir, name + ".stamp")
+    stamp = "|".join(
+        [
+            source_path,
+            str(get_folder_mtime(source_path)),
+            torch.__version__,
+            transformers.__version__,
+        ]
+    )
+
+    if os.path.exists(cache_path) and os.path.exists(stamp_path):
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            cached = f.read() == stamp
+        if cached:
+            try:
+                quantized = torch.load(cache_path)
+                if config.DEBUG_MSG:
+                    print("Loaded quantized model from:", cache_path)
+                return quantized
+            except Exception as e:
+                print("Quantized model cache is unreadable, rebuilding:", e)
+
+    model = load()
+    quantized = quantize_model(model)
+    os.makedirs(cache_dir, exist_ok=True)
+    # written to a temporary file first, so the cache is never half written
+    torch.save(quantized, cache_path + ".tmp")
+    os.replace(cache_path + ".tmp", cache_path)
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        f.write(stamp)
+    if config.DEBUG_MSG:
+        print("Saved quantized model to:", cache_path)
+    return quantized
+
+
+def quantize_model(model: Any) -> Any:
+    """
+    Returns the model with its linear layers dynamically quantized to int8.
+    Quantizes in place, callers pass a copy they no longer need in fp32.
+    """
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        model.eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def get_folder_mtime(path: str) -> float:
+    """
+    Returns the most recent modification time of all files in a folder.
+    """
+    mtimes = [entry.stat().st_mtime for entry in os.scandir(path) if entry.is_file()]
+    return max(mtimes, default=os.path.getmtime(path))
+
+
 def get_uvi_info() -> tuple[int | None, str | None]:
     """
     Returns the port number and host which the electron app defined\n
@@ -123,6 +289,29 @@ def remove_folder(path: str) -> None:
         print("Path is not a directory:", path)
 
 
+def write_arrow_table(table: "pa.Table", path: str) -> None:
+    """
+    Writes a table as Arrow stream file, which can be memory-mapped again.\n
+    The file is written to a temporary path first and then moved into place.
+    """
+    import pyarrow as pa
+
+    with pa.OSFile(path + ".tmp", "wb") as sink:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + ".tmp", path)
+
+
+def read_arrow_table(path: str) -> "pa.Table":
+    """
+    Memory-maps an Arrow stream file written by write_arrow_table().
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_stream(source).read_all()
+
+
 # END FUNCTION BLOCK #########################################################
 
 
@@ -149,6 +338,7 @@ class ConvoText(BaseModel):
     text: str
     trust: float
     tokens: Optional[list[str]] = None
+    profile: Optional[str] = None
 
 
 class DataIndex(BaseModel):
@@ -0,0 +1,121 @@
+# IMPORT BLOCK ###############################################################
+# Lib Imports
+import multiprocessing
+import queue
+import traceback
+from typing import Any, List
+
+from datasets import Dataset, DatasetDict
+
+# Local Imports
+from . import __backend_config as config
+from .classifier import Classifier
+from .utils import setup_env, setup_threads
+
+# END IMPORT BLOCK ###########################################################
+
+
+class TrainingWorker:
+    """
+    Runs classifier epochs in a separate process.\n
+    The loop hands out the rows of an epoch, the worker trains on its own
+    interpreter and torch thread pool and publishes the safetensors file
+    of its checkpoint (or adapter). The serving process only loads it.
+    """
+
+    def __init__(self) -> None:
+        # spawn gives the worker a fresh interpreter (no forked torch threads)
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._events = context.Queue()
+        self._process = context.Process(
+            target=_run_worker, args=(self._tasks, self._events), daemon=True
+        )
+        self.busy = False
+        self.stats: dict[str, Any] = {}
+
+    def start(self) -> None:
+        self._process.start()
+
+    def stop(self) -> None:
+        """
+        Lets the worker finish its current epoch and exit.
+        """
+        if self._process.is_alive():
+            self._tasks.put(None)
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def submit_epoch(self, data: DatasetDict) -> None:
+        """
+        Sends the rows of the next epoch to the worker.
+        Only the columns used for training are transferred.
+        """
+        columns = {
+            split: {"input": data[split]["input"], "mood": data[split]["mood"]}
+            for split in data.keys()
+        }
+        self._tasks.put(columns)
+        self.busy = True
+
+    def poll(self) -> List[str]:
+        """
+        Returns the paths of all weights published since the last poll.
+        Epochs whose checkpoint could not be written publish no path.
+        """
+        paths = []
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if "error" in event:
+                # the worker exits after a failed epoch, busy stays set
+                print("Training worker failed:\n" + event["error"])
+                continue
+            self.busy = False
+            self.stats = event["stats"]
+            if event["path"] is not None:
+                paths.append(event["path"])
+        return paths
+
+
+def _run_worker(tasks: Any, events: Any) -> None:
+    """
+    Entry point of the worker process.
+    Trains one epoch per task until it receives None.
+    """
+    setup_env("train")
+    setup_threads("train")
+    classifier = Classifier(serving=False)
+    if config.DEBUG_MSG:
+        print("Training worker started...")
+    while True:
+        columns = tasks.get()
+        if columns is None:
+            break
+        try:
+            data = DatasetDict(
+                {split: Dataset.from_dict(cols) for split, cols in columns.items()}
+            )
+            classifier.prepare_training(data)
+            while not classifier.step():
+                pass
+            # the checkpoint written at the end of the epoch is published as is
+            path = classifier.wait_for_save()
+        except Exception:
+            # exit so the loop notices and takes over training
+            events.put({"error": traceback.format_exc()})
+            break
+        events.put(
+            {
+                "path": path,
+                "stats": {
+                    "steps_per_second": classifier.steps_per_second,
+                    "peak_memory_mb": classifier.peak_memory_mb,
+                    "save_seconds": classifier.last_save_seconds,
+                },
+            }
+        )
+    classifier.wait_for_save()
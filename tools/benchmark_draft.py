@@ -0,0 +1,95 @@
+import os
+import time
+
+import torch
+from transformers import GPTNeoXForCausalLM, GPTNeoXTokenizerFast
+
+from src_py.utils import SpecialTokens, get_cuda
+
+# TOOL SETTINGS #################################################
+GEN_MODEL = os.path.join("resources", "models", "base", "pythia-mod")
+DRAFT_MODEL = os.path.join("resources", "models", "base", "pythia-draft")
+MAX_NEW_TOKENS = 32
+PROMPTS = [
+    "You are talking to a friend.",
+    "You agree with what your friend just said.",
+    "You doubt the idea your friend just proposed.",
+    "Your friend just lied to you. Tell them you are disappointed in them.",
+]
+INPUTS = [
+    "I think the moon is made of cheese.",
+    "Water boils at 100 degrees celsius at sea level.",
+    "Hello! How are you doing?",
+    "Cats are better than dogs.",
+]
+#################################################################
+
+
+def generate(model, inputs, assistant=None) -> tuple[torch.Tensor, float]:
+    start = time.perf_counter()
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            assistant_model=assistant,
+            do_sample=False,
+            num_beams=1,
+            max_new_tokens=MAX_NEW_TOKENS,
+            pad_token_id=0,
+        )
+    return output, time.perf_counter() - start
+
+
+def acceptance(draft, output: torch.Tensor, prompt_length: int) -> tuple[int, int]:
+    """
+    Counts the generated tokens the draft would have proposed itself (greedy).
+    """
+    with torch.no_grad():
+        logits = draft(output).logits
+    proposed = logits[0, prompt_length - 1 : -1].argmax(dim=-1)
+    generated = output[0, prompt_length:]
+    return int((proposed == generated).sum()), len(generated)
+
+
+def main() -> None:
+    device = get_cuda()
+    tokenizer = GPTNeoXTokenizerFast.from_pretrained(GEN_MODEL)
+    model = GPTNeoXForCausalLM.from_pretrained(GEN_MODEL).to(device).eval()  # type: ignore
+    draft = GPTNeoXForCausalLM.from_pretrained(DRAFT_MODEL).to(device).eval()  # type: ignore
+
+    accepted = total = 0
+    plain_time = plain_tokens = assisted_time = assisted_tokens = 0.0
+    for prompt, text in zip(PROMPTS, INPUTS):
+        string = (
+            SpecialTokens.context
+            + prompt
+            + SpecialTokens.input
+            + text
+            + SpecialTokens.response
+        )
+        inputs = tokenizer(string, return_tensors="pt").to(device)
+        prompt_length = inputs["input_ids"].shape[-1]
+
+        plain, seconds = generate(model, inputs)
+        plain_time += seconds
+        plain_tokens += plain.shape[-1] - prompt_length
+
+        assisted, seconds = generate(model, inputs, assistant=draft)
+        assisted_time += seconds
+        assisted_tokens += assisted.shape[-1] - prompt_length
+
+        if not torch.equal(plain, assisted):
+            print("Warning: assisted output differs from plain greedy output")
+
+        hits, count = acceptance(draft, plain, prompt_length)
+        accepted += hits
+        total += count
+
+    print(
+        f"Acceptance rate: {accepted / max(total, 1):.2%} ({accepted}/{total} tokens)"
+    )
+    print(f"Plain:    {plain_tokens / plain_time:.2f} tokens/s")
+    print(f"Assisted: {assisted_tokens / assisted_time:.2f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import copy
+import os
+import time
+
+import torch
+from transformers import (
+    DebertaV2Tokenizer,
+    DebertaV2ForSequenceClassification,
+    GPTNeoXForCausalLM,
+    GPTNeoXTokenizerFast,
+)
+from datasets import DatasetDict, disable_caching
+
+from src_py.utils import ClassifierLabels, SpecialTokens, quantize_model
+
+# TOOL SETTINGS #################################################
+CLS_MODEL = os.path.join("resources", "models", "base", "inter-classifier")
+GEN_MODEL = os.path.join("resources", "models", "base", "pythia-mod")
+IN_DATA = os.path.join("resources", "data", "base")
+NUM_EXAMPLES = 500
+GEN_PROMPT = (
+    SpecialTokens.context
+    + "You are talking to a friend."
+    + SpecialTokens.input
+    + "I think the moon is made of cheese."
+    + SpecialTokens.response
+)
+#################################################################
+
+
+def evaluate_classifier(model, tokenizer, data) -> tuple[float, float]:
+    """
+    Returns the accuracy and the mean latency per example in seconds.
+    """
+    correct = 0
+    start = time.perf_counter()
+    with torch.no_grad():
+        for example in data:
+            inputs = tokenizer(example["input"], return_tensors="pt")
+            predicted = model(**inputs).logits.argmax().item()
+            correct += int(predicted == ClassifierLabels.dict[example["mood"]])
+    seconds = time.perf_counter() - start
+    return correct / len(data), seconds / len(data)
+
+
+def time_generator(model, tokenizer, runs: int = 5) -> float:
+    """
+    Returns the mean latency of a greedy generation in seconds.
+    """
+    inputs = tokenizer(GEN_PROMPT, return_tensors="pt")
+    start = time.perf_counter()
+    with torch.no_grad():
+        for _ in range(runs):
+            model.generate(**inputs, do_sample=False, max_new_tokens=32, pad_token_id=0)
+    return (time.perf_counter() - start) / runs
+
+
+def main() -> None:
+    disable_caching()
+    torch.set_grad_enabled(False)
+
+    # Classifier
+    data = DatasetDict.load_from_disk(IN_DATA)["test"]
+    data = data.select(range(min(NUM_EXAMPLES, len(data))))
+    tokenizer = DebertaV2Tokenizer.from_pretrained(CLS_MODEL)
+    model = DebertaV2ForSequenceClassification.from_pretrained(
+        CLS_MODEL, num_labels=len(ClassifierLabels.dict)
+    ).eval()  # type: ignore
+    quantized = quantize_model(copy.deepcopy(model))
+
+    acc_fp32, lat_fp32 = evaluate_classifier(model, tokenizer, data)
+    acc_int8, lat_int8 = evaluate_classifier(quantized, tokenizer, data)
+    print(f"Classifier fp32: accuracy {acc_fp32:.2%}, {lat_fp32 * 1000:.1f} ms/example")
+    print(f"Classifier int8: accuracy {acc_int8:.2%}, {lat_int8 * 1000:.1f} ms/example")
+    print(
+        f"Accuracy delta: {acc_int8 - acc_fp32:+.2%}, speedup: {lat_fp32 / lat_int8:.2f}x"
+    )
+
+    # Generator
+    tokenizer = GPTNeoXTokenizerFast.from_pretrained(GEN_MODEL)
+    model = GPTNeoXForCausalLM.from_pretrained(GEN_MODEL).eval()  # type: ignore
+    quantized = quantize_model(copy.deepcopy(model))
+
+    gen_fp32 = time_generator(model, tokenizer)
+    gen_int8 = time_generator(quantized, tokenizer)
+    print(f"Generator fp32: {gen_fp32:.2f} s/response")
+    print(f"Generator int8: {gen_int8:.2f} s/response")
+    print(f"Speedup: {gen_fp32 / gen_int8:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
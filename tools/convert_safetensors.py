@@ -0,0 +1,35 @@
+# idea -> https://huggingface.co/docs/safetensors
+import os
+
+import torch
+from safetensors.torch import save_file
+
+# TOOL SETTINGS #################################################
+MODEL_FOLDERS = [
+    os.path.join("resources", "models", "base"),
+    os.path.join("resources", "models", "current"),
+]
+REMOVE_BIN = False  # from_pretrained prefers model.safetensors if both exist
+#################################################################
+
+# from_pretrained memory-maps model.safetensors instead of unpickling
+# pytorch_model.bin, which cuts the backend start-up time.
+# Checkpoints written by the classifier are already safetensors.
+for folder in MODEL_FOLDERS:
+    if not os.path.isdir(folder):
+        continue
+    for name in sorted(os.listdir(folder)):
+        model_path = os.path.join(folder, name)
+        bin_path = os.path.join(model_path, "pytorch_model.bin")
+        out_path = os.path.join(model_path, "model.safetensors")
+        if not os.path.isfile(bin_path) or os.path.isfile(out_path):
+            continue
+
+        state_dict = torch.load(bin_path, map_location="cpu")
+        # tied weights share storage which safetensors does not allow
+        state_dict = {k: v.contiguous().clone() for k, v in state_dict.items()}
+        save_file(state_dict, out_path, metadata={"format": "pt"})
+        print(f"Converted {bin_path} -> {out_path}")
+
+        if REMOVE_BIN:
+            os.remove(bin_path)
@@ -49,5 +49,5 @@ print(f"New number of tokens: {model.resize_token_embeddings().num_embeddings}")
 
 # Save the modified tokenizer and model
 tokenizer.save_pretrained(OUT_MODEL)
-model.save_pretrained(OUT_MODEL)
+model.save_pretrained(OUT_MODEL, safe_serialization=True)
 print(f"Saved modified tokenizer and model to {OUT_MODEL}")
@@ -0,0 +1,27 @@
+# idea -> https://huggingface.co/blog/assisted-generation
+import os
+from transformers import GPTNeoXForCausalLM, GPTNeoXTokenizerFast
+
+# TOOL SETTINGS #################################################
+IN_MODEL = os.path.join("resources_dev", "models_origin", "pythia-160m-deduped")
+GEN_MODEL = os.path.join("resources", "models", "base", "pythia-mod")
+OUT_MODEL = os.path.join("resources", "models", "base", "pythia-draft")
+#################################################################
+
+# The draft model has to share the token ids of the generator.
+# Instead of adding the special tokens again (see generator_add_tokens.py),
+# the generator tokenizer is reused and the draft embeddings are resized to match.
+tokenizer: GPTNeoXTokenizerFast = GPTNeoXTokenizerFast.from_pretrained(GEN_MODEL)
+gen_vocab_size = GPTNeoXForCausalLM.from_pretrained(GEN_MODEL).config.vocab_size  # type: ignore
+model: GPTNeoXForCausalLM = GPTNeoXForCausalLM.from_pretrained(IN_MODEL)  # type: ignore
+
+orig_num_tokens = model.resize_token_embeddings().num_embeddings
+print(f"Original number of draft tokens: {orig_num_tokens}")
+if orig_num_tokens != gen_vocab_size:
+    model.resize_token_embeddings(new_num_tokens=gen_vocab_size)
+print(f"New number of draft tokens: {model.resize_token_embeddings().num_embeddings}")
+
+# Save the draft model next to the generator
+tokenizer.save_pretrained(OUT_MODEL)
+model.save_pretrained(OUT_MODEL, safe_serialization=True)
+print(f"Saved draft tokenizer and model to {OUT_MODEL}")